@@ -1,26 +1,39 @@
-from flask import Flask, request, jsonify, session, render_template, redirect, url_for, flash
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Blueprint, request, jsonify, session, render_template, redirect, url_for, flash, g, abort, make_response, current_app, Response, stream_with_context
 import mysql.connector
 import os
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import calendar
 import bcrypt
+import click
+from flask.cli import AppGroup, with_appcontext
 from dotenv import load_dotenv
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import numpy as np
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+from werkzeug.http import is_resource_modified
 import io
-import base64
-from matplotlib.colors import LinearSegmentedColormap
+import heapq
+import csv
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import importlib
+import sys
 import threading
-import time
+import asyncio
+import socket
+import secrets
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key')
+# Routes and CLI commands live on this blueprint; create_app() builds the app.
+# matplotlib and numpy are imported on first use so workers start quickly.
+bp = Blueprint('main', __name__, cli_group=None)
 
 # Database connection
 def get_db_connection():
@@ -31,6 +44,111 @@ def get_db_connection():
         database=os.environ.get('DB_NAME', 'expense_tracker')
     )
 
+# Connection pool
+class ConnectionPool:
+    """Keeps up to `size` idle MySQL connections around for reuse.
+
+    Up to `max_overflow` extra connections may be opened under load; they are
+    closed again when returned instead of being kept idle. Idle connections
+    older than `idle_timeout` seconds, or that fail a ping on checkout, are
+    discarded and replaced with a fresh one.
+    """
+
+    def __init__(self, size=5, max_overflow=10, idle_timeout=300, checkout_timeout=30):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self._idle = []
+        self._checked_out = 0
+        self._condition = threading.Condition()
+
+    def get_connection(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        
+        while True:
+            conn = None
+            with self._condition:
+                while not self._idle and self._checked_out >= self.size + self.max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RuntimeError('Timed out waiting for a database connection')
+                    self._condition.wait(remaining)
+                
+                self._checked_out += 1
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+            
+            if conn is None:
+                try:
+                    return get_db_connection()
+                except Exception:
+                    self._forget()
+                    raise
+            
+            # Health check on checkout
+            if time.monotonic() - returned_at <= self.idle_timeout and self._is_healthy(conn):
+                return conn
+            
+            self._close_quietly(conn)
+            self._forget()
+
+    def release(self, conn):
+        try:
+            # End any open transaction so the next borrower gets a fresh snapshot
+            conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        
+        with self._condition:
+            self._checked_out -= 1
+            keep = healthy and len(self._idle) < self.size
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+        
+        if not keep:
+            self._close_quietly(conn)
+
+    def _forget(self):
+        with self._condition:
+            self._checked_out -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+db_pool = ConnectionPool(
+    size=int(os.environ.get('DB_POOL_SIZE', 5)),
+    max_overflow=int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+    idle_timeout=int(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+    checkout_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30))
+)
+
+def get_db():
+    """Return the connection borrowed for the current app context."""
+    if 'db_conn' not in g:
+        g.db_conn = db_pool.get_connection()
+    return g.db_conn
+
+def release_db(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
 # Initialize database
 def init_db():
     conn = get_db_connection()
@@ -88,181 +206,708 @@ def init_db():
     )
     ''')
     
+    # Create daily_totals table; funds are stored under the empty category
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS daily_totals (
+        user_id INT NOT NULL,
+        date DATE NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        expense_sum DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        fund_sum DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        txn_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, date, category),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    ''')
+    
+    # Create monthly_category_totals table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS monthly_category_totals (
+        user_id INT NOT NULL,
+        year INT NOT NULL,
+        month INT NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        total DECIMAL(12, 2) NOT NULL,
+        PRIMARY KEY (user_id, year, month, category),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    ''')
+    
+    # Create user_data_versions table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_data_versions (
+        user_id INT PRIMARY KEY,
+        version INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    ''')
+    
+    # Create scheduled_jobs table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS scheduled_jobs (
+        name VARCHAR(64) PRIMARY KEY,
+        last_scheduled_for DATETIME,
+        last_started_at DATETIME,
+        last_finished_at DATETIME,
+        last_status VARCHAR(255),
+        run_by VARCHAR(255)
+    )
+    ''')
+    
+    # Create purge_checkpoints table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS purge_checkpoints (
+        table_name VARCHAR(64) PRIMARY KEY,
+        cutoff DATE NOT NULL,
+        last_id INT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # Indexes; see INDEXES for which queries each one serves
+    for table, name, columns in INDEXES:
+        ensure_index(cursor, table, name, columns)
+    
     conn.commit()
     cursor.close()
     conn.close()
 
-# Initialize database on startup
-init_db()
+INDEXES = [
+    # InnoDB appends the primary key, so this also serves the (date, id) keyset seek
+    ('expenses', 'idx_expenses_user_date', 'user_id, date'),
+    # Covers the dashboard's id, date, amount read of the month's funds
+    ('funds', 'idx_funds_user_date_amount', 'user_id, date, amount')
+]
+
+def ensure_index(cursor, table, name, columns):
+    # MySQL has no CREATE INDEX IF NOT EXISTS
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, name)
+    )
+    if not cursor.fetchone():
+        cursor.execute(f"CREATE INDEX {name} ON {table}({columns})")
+
+db_cli = AppGroup('db', help='Manage the database schema.')
+bp.cli.add_command(db_cli)
+
+@db_cli.command('init')
+def init_db_command():
+    """Create any missing tables."""
+    init_db()
+    click.echo('Initialized the database.')
+
+# Money
+# Amounts are handled as integer paise from the moment they leave the database
+# until they are displayed, so sums are exact and vectorise as int64.
+def to_paise(amount):
+    """Convert a rupee amount (Decimal, string or number) to integer paise."""
+    return int(Decimal(amount).scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+def from_paise(paise):
+    # Exact Decimal rupees, for DECIMAL(10, 2) columns
+    return Decimal(paise).scaleb(-2)
+
+@bp.app_template_filter('rupees')
+def format_rupees(paise):
+    return f"{from_paise(paise):.2f}"
+
+# Column projections
+# Each use case selects only the columns it reads, so wide columns (descriptions,
+# password hashes, timestamps) never cross the wire when they are not needed.
+PROJECTIONS = {
+    'expense_list': "id, date, category, amount, description",
+    # Funds have no category or description; the NULLs line fund rows up with
+    # expense_list so the two lists can be combined with UNION ALL
+    'fund_list': "id, date, NULL, amount, NULL",
+    'top_expenses': "category, description, amount",
+    'login': "id, name, email, password",
+    'profile': "id, name, email"
+}
+
+# Server-side sessions
+# The session cookie only carries a random id; the session itself lives in a
+# store with a Redis-style get/set(ex=)/delete interface. SESSION_BACKEND picks
+# the store: "redis" (needs the redis package; shared by every host), "sqlite"
+# (a local file shared by the workers of one host, so only for a single host or
+# sticky load balancing), "memory" (an in-process LRU, for a single worker) or
+# "cookie" for Flask's signed cookie sessions. The default is "cookie", which
+# works behind any load balancer; a server-side store has to be chosen
+# explicitly. With redis or sqlite, each worker keeps recently read sessions in
+# memory for SESSION_CACHE_SECONDS.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cookie')
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 10000))
+SESSION_CACHE_SECONDS = float(os.environ.get('SESSION_CACHE_SECONDS', 5))
+SESSION_KEY_PREFIX = 'session:'
+
+class MemoryStore:
+    """LRU of up to `max_entries` values, each expiring after its own TTL."""
+
+    def __init__(self, max_entries, max_ttl=None):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ex=None):
+        if self.max_ttl is not None:
+            ex = min(ex, self.max_ttl) if ex else self.max_ttl
+        expires_at = time.monotonic() + ex if ex else float('inf')
+        
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+class SQLiteStore:
+    """Key-value store in a local SQLite file, one connection per thread."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS store (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM store WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ex=None):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO store (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ex if ex else None)
+        )
+        
+        # Expired rows are never read again, so clear them out now and then
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM store WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM store WHERE key = ?", (key,))
+
+class TieredStore:
+    """An in-process MemoryStore in front of a shared store.
+
+    Writes go through to both. Reads are served from memory for up to
+    SESSION_CACHE_SECONDS, so another worker's change can take that long to show.
+    """
+
+    def __init__(self, memory, backing):
+        self.memory = memory
+        self.backing = backing
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None:
+            value = self.backing.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value, ex=None):
+        self.backing.set(key, value, ex=ex)
+        self.memory.set(key, value, ex=ex)
+
+    def delete(self, key):
+        self.backing.delete(key)
+        self.memory.delete(key)
+
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, new=False):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        self.rotate = False
+
+    def regenerate(self):
+        # Issue a new id on the next save, e.g. after logging in
+        self.rotate = True
+        self.modified = True
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(SESSION_KEY_PREFIX + sid)
+            if data is not None:
+                try:
+                    return ServerSession(self.serializer.loads(data), sid=sid)
+                except ValueError:
+                    pass
+        
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+        
+        if session.accessed:
+            response.vary.add('Cookie')
+        
+        if not session:
+            if session.modified:
+                self.store.delete(SESSION_KEY_PREFIX + session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly)
+            return
+        
+        if not self.should_set_cookie(app, session):
+            return
+        
+        if session.rotate:
+            self.store.delete(SESSION_KEY_PREFIX + session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.rotate = False
+        
+        self.store.set(SESSION_KEY_PREFIX + session.sid, self.serializer.dumps(dict(session)).encode('utf-8'), ex=self.ttl)
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session),
+            httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite
+        )
+
+def make_session_interface(app):
+    if SESSION_BACKEND == 'cookie':
+        return app.session_interface
+    
+    if SESSION_BACKEND == 'memory':
+        return ServerSessionInterface(MemoryStore(SESSION_CACHE_SIZE), SESSION_TTL)
+    
+    if SESSION_BACKEND == 'redis':
+        import redis
+        store = redis.Redis.from_url(os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/0'))
+    elif SESSION_BACKEND == 'sqlite':
+        path = os.environ.get('SESSION_SQLITE_PATH') or os.path.join(app.instance_path, 'sessions.sqlite3')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        store = SQLiteStore(path)
+    else:
+        raise ValueError(f'Unknown SESSION_BACKEND: {SESSION_BACKEND}')
+    
+    if SESSION_CACHE_SECONDS > 0:
+        store = TieredStore(MemoryStore(SESSION_CACHE_SIZE, max_ttl=SESSION_CACHE_SECONDS), store)
+    
+    return ServerSessionInterface(store, SESSION_TTL)
+
+def regenerate_session():
+    # Cookie sessions have no server-side id to rotate
+    if isinstance(session._get_current_object(), ServerSession):
+        session.regenerate()
 
 # Helper functions
+# The signed-in user's profile is kept in the session and re-read from MySQL
+# once it is older than PROFILE_TTL seconds.
+PROFILE_TTL = int(os.environ.get('PROFILE_TTL', 300))
+
+def cache_user_profile(user):
+    session['user_id'] = user['id']
+    session['user_name'] = user['name']
+    session['user_email'] = user['email']
+    session['profile_expires'] = time.time() + PROFILE_TTL
+
 def get_user_data():
     if 'user_id' not in session:
         return None
     
-    conn = get_db_connection()
+    if session.get('profile_expires', 0) > time.time():
+        return {'id': session['user_id'], 'name': session['user_name'], 'email': session['user_email']}
+    
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
-    cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (session['user_id'],))
+    cursor.execute(f"SELECT {PROJECTIONS['profile']} FROM users WHERE id = %s", (session['user_id'],))
     user = cursor.fetchone()
     
     cursor.close()
-    conn.close()
+    
+    if user:
+        cache_user_profile(user)
     
     return user
 
-def get_current_month_expenses(user_id):
-    conn = get_db_connection()
+def get_monthly_rollup(user_id, year, month):
+    # Totals in paise for one month, zero if the user had no transactions in it
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
-    today = datetime.now()
-    first_day = datetime(today.year, today.month, 1)
-    last_day = datetime(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
-    
     cursor.execute(
-        "SELECT * FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s ORDER BY date DESC",
-        (user_id, first_day, last_day)
+        "SELECT total_expenses, total_funds, savings FROM monthly_savings WHERE user_id = %s AND month = %s AND year = %s",
+        (user_id, month, year)
     )
-    expenses = cursor.fetchall()
+    rollup = cursor.fetchone()
     
     cursor.close()
-    conn.close()
-    
-    return expenses
-
-def get_current_month_funds(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
     
-    today = datetime.now()
-    first_day = datetime(today.year, today.month, 1)
-    last_day = datetime(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
+    if not rollup:
+        return {'total_expenses': 0, 'total_funds': 0, 'savings': 0}
     
+    return {
+        'total_expenses': to_paise(rollup['total_expenses']),
+        'total_funds': to_paise(rollup['total_funds']),
+        'savings': to_paise(rollup['savings'])
+    }
+
+def add_to_monthly_rollup(cursor, user_id, day, expenses=0, funds=0):
+    # Runs inside the caller's transaction so the rollup moves with the write.
+    # Amounts are in paise and written as exact decimals.
     cursor.execute(
-        "SELECT * FROM funds WHERE user_id = %s AND date BETWEEN %s AND %s ORDER BY date DESC",
-        (user_id, first_day, last_day)
+        """
+        INSERT INTO monthly_savings (user_id, month, year, total_expenses, total_funds, savings)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_expenses = total_expenses + VALUES(total_expenses),
+            total_funds = total_funds + VALUES(total_funds),
+            savings = savings + VALUES(savings)
+        """,
+        (user_id, day.month, day.year, from_paise(expenses), from_paise(funds), from_paise(funds - expenses))
+    )
+
+def add_to_category_rollup(cursor, user_id, totals):
+    # Adds (day, category, expenses in paise) to monthly_category_totals, in the
+    # caller's transaction like add_to_monthly_rollup
+    cursor.executemany(
+        """
+        INSERT INTO monthly_category_totals (user_id, year, month, category, total)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+        """,
+        [(user_id, day.year, day.month, category, from_paise(expenses)) for day, category, expenses in totals]
+    )
+
+# Daily totals
+# daily_totals holds one row per user, day and category (funds under '') and is
+# kept up to date on every write, so analytics scale with days x categories
+# rather than with the number of transactions.
+FUNDS_CATEGORY = ''
+
+def add_to_daily_totals(cursor, user_id, totals):
+    """Add (day, category, expenses, funds, count) tuples, amounts in paise, to daily_totals.
+
+    Runs inside the caller's transaction, like add_to_monthly_rollup.
+    """
+    cursor.executemany(
+        """
+        INSERT INTO daily_totals (user_id, date, category, expense_sum, fund_sum, txn_count)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            expense_sum = expense_sum + VALUES(expense_sum),
+            fund_sum = fund_sum + VALUES(fund_sum),
+            txn_count = txn_count + VALUES(txn_count)
+        """,
+        [
+            (user_id, day, category, from_paise(expenses), from_paise(funds), count)
+            for day, category, expenses, funds, count in totals
+        ]
     )
-    funds = cursor.fetchall()
+
+# Chart rendering
+# Each chart gets its own Figure/FigureCanvasAgg pair instead of going through
+# pyplot's global figure manager, so charts can be rendered from several threads.
+CHART_TEMPLATES = {
+    'category': {'figsize': (8, 6), 'title': 'Expenses by Category'},
+    'monthly': {'figsize': (10, 6), 'title': 'Monthly Expenses', 'xlabel': 'Month', 'ylabel': 'Amount (₹)', 'color': '#3b82f6'},
+    'balance': {'figsize': (10, 6), 'title': 'Balance Trend', 'xlabel': 'Date', 'ylabel': 'Balance (₹)', 'color': '#10b981', 'grid': True},
+    'top': {'figsize': (10, 6), 'title': 'Top Expenses', 'xlabel': 'Amount (₹)', 'ylabel': 'Description', 'color': '#f43f5e'}
+}
+
+CATEGORY_COLORS = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40', '#C9CBCF']
+
+def new_chart(kind):
+    # Create a figure and axes styled from the chart kind's template
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    template = CHART_TEMPLATES[kind]
+    
+    fig = Figure(figsize=template['figsize'])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    
+    ax.set_title(template['title'])
+    if 'xlabel' in template:
+        ax.set_xlabel(template['xlabel'])
+    if 'ylabel' in template:
+        ax.set_ylabel(template['ylabel'])
+    if template.get('grid'):
+        ax.grid(True, linestyle='--', alpha=0.7)
+    
+    return fig, ax
+
+def render_placeholder_chart(kind, format='png'):
+    # Shown when a chart could not be rendered in time
+    fig, ax = new_chart(kind)
+    ax.text(0.5, 0.5, 'Chart unavailable', ha='center', va='center', transform=ax.transAxes)
     
-    cursor.close()
-    conn.close()
+    return save_chart(fig, format)
+
+def save_chart(fig, format='png'):
+    # Save the figure as PNG or SVG bytes
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=format)
+    image = buffer.getvalue()
+    buffer.close()
     
-    return funds
+    return image
 
-def get_monthly_summary(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+def render_category_chart(categories, format='png'):
+    if not categories:
+        return None
     
-    today = datetime.now()
-    month = today.month
-    year = today.year
+    # Create pie chart
+    labels = [category['category'] for category in categories]
+    sizes = [category['total'] for category in categories]
     
-    cursor.execute(
-        "SELECT * FROM monthly_savings WHERE user_id = %s AND month = %s AND year = %s",
-        (user_id, month, year)
-    )
-    summary = cursor.fetchone()
+    fig, ax = new_chart('category')
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=CATEGORY_COLORS)
+    ax.axis('equal')
     
-    if not summary:
-        # Calculate summary if not exists
-        first_day = datetime(year, month, 1)
-        last_day = datetime(year, month, calendar.monthrange(year, month)[1])
-        
-        # Get total expenses
-        cursor.execute(
-            "SELECT SUM(amount) as total FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s",
-            (user_id, first_day, last_day)
-        )
-        total_expenses_result = cursor.fetchone()
-        total_expenses = total_expenses_result['total'] if total_expenses_result['total'] else 0
-        
-        # Get total funds
-        cursor.execute(
-            "SELECT SUM(amount) as total FROM funds WHERE user_id = %s AND date BETWEEN %s AND %s",
-            (user_id, first_day, last_day)
-        )
-        total_funds_result = cursor.fetchone()
-        total_funds = total_funds_result['total'] if total_funds_result['total'] else 0
-        
-        # Calculate savings
-        savings = float(total_funds) - float(total_expenses)
-        
-        summary = {
-            'month': month,
-            'year': year,
-            'total_expenses': float(total_expenses),
-            'total_funds': float(total_funds),
-            'savings': savings
-        }
+    return save_chart(fig, format)
+
+def render_monthly_chart(monthly_data, format='png'):
+    # Create bar chart
+    months = [data['month'] for data in monthly_data]
+    amounts = [data['amount'] / 100 for data in monthly_data]
     
-    cursor.close()
-    conn.close()
+    fig, ax = new_chart('monthly')
+    bars = ax.bar(months, amounts, color=CHART_TEMPLATES['monthly']['color'])
+    
+    # Add data labels
+    for bar in bars:
+        height = bar.get_height()
+        if height > 0:
+            ax.text(bar.get_x() + bar.get_width()/2., height + 50,
+                    f'₹{int(height)}', ha='center', va='bottom')
     
-    # Get month name
-    month_name = calendar.month_name[month if isinstance(month, int) else int(month)]
+    ax.set_ylim(0, max(amounts) * 1.2 if max(amounts) > 0 else 1000)
     
-    return {
-        'month': month_name,
-        'year': summary['year'],
-        'total_expenses': float(summary['total_expenses']),
-        'total_funds': float(summary['total_funds']),
-        'savings': float(summary['savings'])
-    }
+    return save_chart(fig, format)
 
-def get_previous_month_savings(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+def render_balance_chart(dates, balances, format='png'):
+    # Create line chart
+    balances = [balance / 100 for balance in balances]
+    fig, ax = new_chart('balance')
+    ax.plot(dates, balances, marker='o', linestyle='-', color=CHART_TEMPLATES['balance']['color'])
     
-    today = datetime.now()
-    previous_month = today.month - 1
-    year = today.year
+    # Add data labels for first and last points
+    if balances:
+        ax.text(0, balances[0], f'₹{int(balances[0])}', ha='left', va='bottom')
+        ax.text(len(dates)-1, balances[-1], f'₹{int(balances[-1])}', ha='right', va='bottom')
     
-    if previous_month == 0:
-        previous_month = 12
-        year -= 1
+    # Rotate x-axis labels for better readability
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
     
-    cursor.execute(
-        "SELECT * FROM monthly_savings WHERE user_id = %s AND month = %s AND year = %s",
-        (user_id, previous_month, year)
-    )
-    savings = cursor.fetchone()
+    return save_chart(fig, format)
+
+def render_top_expenses_chart(expenses, format='png'):
+    if not expenses:
+        return None
+    
+    # Create bar chart
+    labels = []
+    amounts = []
+    
+    for expense in expenses:
+        description = expense['description'] if expense['description'] else expense['category']
+        labels.append(description[:15] + '...' if len(description) > 15 else description)
+        amounts.append(to_paise(expense['amount']) / 100)
+    
+    fig, ax = new_chart('top')
+    bars = ax.barh(labels, amounts, color=CHART_TEMPLATES['top']['color'])
+    
+    # Add data labels
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width + 50, bar.get_y() + bar.get_height()/2, f'₹{int(width)}', ha='left', va='center')
     
-    if not savings:
-        # Calculate if not exists
-        first_day = datetime(year, previous_month, 1)
-        last_day = datetime(year, previous_month, calendar.monthrange(year, previous_month)[1])
+    fig.tight_layout()
+    
+    return save_chart(fig, format)
+
+# Transaction batches
+class TransactionBatch:
+    """Transactions held as parallel NumPy arrays instead of one dict per row.
+
+    `days` are date ordinals (int32), `amounts` are in paise (int64), `is_fund`
+    tells funds from expenses and `category_codes` index into `categories`
+    (uint8 unless a user has more than 256 categories).
+    """
+
+    __slots__ = ('days', 'amounts', 'is_fund', 'category_codes', 'categories')
+
+    CHUNK_SIZE = 1000
+
+    def __init__(self, days, amounts, is_fund, category_codes, categories):
+        self.days = days
+        self.amounts = amounts
+        self.is_fund = is_fund
+        self.category_codes = category_codes
+        self.categories = categories
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a batch from (is_fund, date, category, amount) rows.
+
+        Rows are packed into arrays a chunk at a time, so only one chunk of
+        Python objects is alive at once.
+        """
+        import numpy as np
         
-        # Get total expenses
-        cursor.execute(
-            "SELECT SUM(amount) as total FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s",
-            (user_id, first_day, last_day)
-        )
-        total_expenses_result = cursor.fetchone()
-        total_expenses = total_expenses_result['total'] if total_expenses_result['total'] else 0
+        codes = {}
+        chunks = []
+        chunk = []
         
-        # Get total funds
-        cursor.execute(
-            "SELECT SUM(amount) as total FROM funds WHERE user_id = %s AND date BETWEEN %s AND %s",
-            (user_id, first_day, last_day)
-        )
-        total_funds_result = cursor.fetchone()
-        total_funds = total_funds_result['total'] if total_funds_result['total'] else 0
+        def pack():
+            is_fund, days, categories, amounts = zip(*chunk)
+            chunks.append((
+                np.array([day.toordinal() for day in days], dtype=np.int32),
+                np.array([to_paise(amount) for amount in amounts], dtype=np.int64),
+                np.array(is_fund, dtype=np.bool_),
+                np.array([codes.setdefault(category, len(codes)) for category in categories], dtype=np.int64)
+            ))
+            chunk.clear()
         
-        # Calculate savings
-        savings_amount = float(total_funds) - float(total_expenses)
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= cls.CHUNK_SIZE:
+                pack()
+        if chunk:
+            pack()
         
-        cursor.close()
-        conn.close()
+        if not chunks:
+            return cls(np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.bool_), np.empty(0, np.uint8), [])
+        
+        days, amounts, is_fund, category_codes = (np.concatenate(column) for column in zip(*chunks))
+        code_type = np.uint8 if len(codes) <= 256 else np.uint16
+        
+        return cls(days, amounts, is_fund, category_codes.astype(code_type), list(codes))
+
+    @classmethod
+    def concat(cls, batches):
+        """Join batches built separately, e.g. by concurrent queries, into one."""
+        import numpy as np
+        
+        codes = {}
+        columns = []
+        for batch in batches:
+            # Map each batch's category codes onto the combined category list
+            remap = np.array([codes.setdefault(category, len(codes)) for category in batch.categories], dtype=np.int64)
+            columns.append((batch.days, batch.amounts, batch.is_fund, remap[batch.category_codes]))
+        
+        days, amounts, is_fund, category_codes = (np.concatenate(column) for column in zip(*columns))
+        code_type = np.uint8 if len(codes) <= 256 else np.uint16
+        
+        return cls(days, amounts, is_fund, category_codes.astype(code_type), list(codes))
+
+    def _between(self, start, end):
+        return (self.days >= start.toordinal()) & (self.days <= end.toordinal())
+
+    def total(self, start, end, funds=False):
+        """Sum of expenses (or funds) between start and end, in paise."""
+        mask = self._between(start, end) & (self.is_fund == funds)
+        return int(self.amounts[mask].sum())
+
+    def category_totals(self, start, end):
+        """Expense totals per category between start and end, in paise."""
+        import numpy as np
+        
+        mask = self._between(start, end) & ~self.is_fund
+        # bincount sums in float64, which is exact for paise totals below 2**53
+        totals = np.bincount(
+            self.category_codes[mask], weights=self.amounts[mask], minlength=len(self.categories)
+        ).astype(np.int64)
+        
+        return [
+            {'category': self.categories[code], 'total': int(total)}
+            for code, total in enumerate(totals)
+            if total
+        ]
+
+    def balance_series(self, start, end):
+        """Running balance for each day from start to end, in paise."""
+        import numpy as np
+        
+        days = (end - start).days + 1
+        if days <= 0:
+            return []
         
-        return savings_amount
+        mask = self._between(start, end)
+        offsets = self.days[mask] - start.toordinal()
+        signed = np.where(self.is_fund[mask], self.amounts[mask], -self.amounts[mask])
+        daily = np.bincount(offsets, weights=signed, minlength=days)
+        
+        return daily.cumsum().astype(np.int64).tolist()
+
+def day_labels(start, end):
+    return [(start + timedelta(days=offset)).strftime('%b %d') for offset in range((end - start).days + 1)]
+
+def balance_series(user_id, start, end):
+    """Return (date labels, running balances in paise) for each day from start to end."""
+    conn = get_db()
+    # Plain tuple cursor: no per-row dict is built for these aggregation-only rows
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        "SELECT date, SUM(fund_sum), SUM(expense_sum) FROM daily_totals WHERE user_id = %s AND date BETWEEN %s AND %s GROUP BY date",
+        (user_id, start, end)
+    )
+    batch = TransactionBatch.from_rows(
+        row
+        for day, funds, expenses in cursor
+        for row in ((True, day, None, funds), (False, day, None, expenses))
+    )
     
     cursor.close()
-    conn.close()
     
-    return float(savings['savings'])
+    return day_labels(start, end), batch.balance_series(start, end)
 
-def generate_category_chart(user_id):
-    conn = get_db_connection()
+def get_category_totals(user_id):
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
     today = datetime.now()
@@ -270,210 +915,150 @@ def generate_category_chart(user_id):
     last_day = datetime(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
     
     cursor.execute(
-        "SELECT category, SUM(amount) as total FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s GROUP BY category",
-        (user_id, first_day, last_day)
+        "SELECT category, SUM(expense_sum) as total FROM daily_totals WHERE user_id = %s AND date BETWEEN %s AND %s AND category <> %s GROUP BY category",
+        (user_id, first_day, last_day, FUNDS_CATEGORY)
     )
-    categories = cursor.fetchall()
+    categories = [
+        {'category': category['category'], 'total': to_paise(category['total'])}
+        for category in cursor.fetchall()
+    ]
     
     cursor.close()
-    conn.close()
-    
-    if not categories:
-        return None
-    
-    # Create pie chart
-    labels = [category['category'] for category in categories]
-    sizes = [float(category['total']) for category in categories]
     
-    # Custom colors
-    colors = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40', '#C9CBCF']
+    return categories
+
+# Period start for each supported granularity, used as the GROUP BY key
+PERIOD_EXPRESSIONS = {
+    'day': "date",
+    'week': "DATE_SUB(date, INTERVAL WEEKDAY(date) DAY)",
+    'month': "DATE_SUB(date, INTERVAL DAYOFMONTH(date) - 1 DAY)"
+}
+
+def period_starts(start, end, granularity):
+    # Every period start from the one containing `start` up to `end`
+    if granularity == 'day':
+        current = start
+    elif granularity == 'week':
+        current = start - timedelta(days=start.weekday())
+    else:
+        current = start.replace(day=1)
+    
+    while current <= end:
+        yield current
+        if granularity == 'day':
+            current += timedelta(days=1)
+        elif granularity == 'week':
+            current += timedelta(days=7)
+        elif current.month == 12:
+            current = current.replace(year=current.year + 1, month=1)
+        else:
+            current = current.replace(month=current.month + 1)
+
+def period_totals(user_id, start, end, granularity='month'):
+    """Return expense and fund totals in paise per day, week or month between start and end (inclusive).
+
+    Totals are summed from daily_totals with one range scan of the user's
+    primary-key prefix, grouped by period start. Each period also gets a
+    {category: total} breakdown of its expenses; periods without rows are
+    included with zeros.
+    """
+    if granularity not in PERIOD_EXPRESSIONS:
+        raise ValueError(f'Unknown granularity: {granularity}')
+    
+    totals = {
+        period: {'period': period, 'expenses': 0, 'funds': 0, 'categories': {}}
+        for period in period_starts(start, end, granularity)
+    }
     
-    plt.figure(figsize=(8, 6))
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    plt.axis('equal')
-    plt.title('Expenses by Category')
+    conn = get_db()
+    cursor = conn.cursor()
     
-    # Save to base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_png = buffer.getvalue()
-    buffer.close()
-    plt.close()
+    cursor.execute(
+        f"SELECT {PERIOD_EXPRESSIONS[granularity]} AS period, category, SUM(expense_sum), SUM(fund_sum) FROM daily_totals WHERE user_id = %s AND date >= %s AND date < %s GROUP BY period, category",
+        (user_id, start, end + timedelta(days=1))
+    )
+    for period, category, expenses, funds in cursor.fetchall():
+        entry = totals[period]
+        entry['expenses'] += to_paise(expenses)
+        entry['funds'] += to_paise(funds)
+        if category != FUNDS_CATEGORY:
+            entry['categories'][category] = to_paise(expenses)
     
-    graphic = base64.b64encode(image_png).decode('utf-8')
+    cursor.close()
     
-    return graphic
+    return list(totals.values())
 
-def generate_monthly_chart(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    today = datetime.now()
-    year = today.year
-    
-    monthly_data = []
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+def monthly_history(user_id, start, end, by_category=False):
+    """Return expense and fund totals in paise for each month from start to end (inclusive).
+
+    Months inside the raw retention window come from period_totals. Older
+    months, whose raw rows have been purged, come from the monthly_savings and
+    monthly_category_totals rollups. With by_category each month also gets a
+    {category: total} breakdown of its expenses.
+    """
+    months = list(period_starts(start, end, 'month'))
+    cutoff = retention_cutoff()
+    
+    history = {month: {'period': month, 'expenses': 0, 'funds': 0} for month in months}
+    if by_category:
+        for entry in history.values():
+            entry['categories'] = {}
+    
+    if not months:
+        return []
+    
+    conn = get_db()
+    cursor = conn.cursor()
     
-    for month in range(1, 13):
-        first_day = datetime(year, month, 1)
-        last_day = datetime(year, month, calendar.monthrange(year, month)[1])
+    if months[0] < cutoff:
+        first_month = month_index(months[0])
+        last_month = min(month_index(months[-1]), month_index(cutoff) - 1)
         
-        # Skip future months
-        if first_day > today:
-            monthly_data.append({
-                'month': calendar.month_abbr[month],
-                'amount': 0
-            })
-            continue
-        
-        # Get total expenses
         cursor.execute(
-            "SELECT SUM(amount) as total FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s",
-            (user_id, first_day, last_day)
+            "SELECT year, month, total_expenses, total_funds FROM monthly_savings WHERE user_id = %s AND year * 12 + month - 1 BETWEEN %s AND %s",
+            (user_id, first_month, last_month)
         )
-        total_expenses_result = cursor.fetchone()
-        total_expenses = total_expenses_result['total'] if total_expenses_result['total'] else 0
+        for year, month, expenses, funds in cursor.fetchall():
+            history[date(year, month, 1)].update(expenses=to_paise(expenses), funds=to_paise(funds))
         
-        monthly_data.append({
-            'month': calendar.month_abbr[month],
-            'amount': float(total_expenses)
-        })
+        if by_category:
+            cursor.execute(
+                "SELECT year, month, category, total FROM monthly_category_totals WHERE user_id = %s AND year * 12 + month - 1 BETWEEN %s AND %s",
+                (user_id, first_month, last_month)
+            )
+            for year, month, category, total in cursor.fetchall():
+                history[date(year, month, 1)]['categories'][category] = to_paise(total)
     
     cursor.close()
-    conn.close()
     
-    # Create bar chart
-    months = [data['month'] for data in monthly_data]
-    amounts = [data['amount'] for data in monthly_data]
+    if months[-1] >= cutoff:
+        for totals in period_totals(user_id, max(months[0], cutoff), end, 'month'):
+            entry = history[totals['period']]
+            entry.update(expenses=totals['expenses'], funds=totals['funds'])
+            if by_category:
+                entry['categories'] = totals['categories']
     
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(months, amounts, color='#3b82f6')
-    
-    # Add data labels
-    for bar in bars:
-        height = bar.get_height()
-        if height > 0:
-            plt.text(bar.get_x() + bar.get_width()/2., height + 50,
-                    f'₹{int(height)}', ha='center', va='bottom')
-    
-    plt.title('Monthly Expenses')
-    plt.xlabel('Month')
-    plt.ylabel('Amount (₹)')
-    plt.ylim(0, max(amounts) * 1.2 if max(amounts) > 0 else 1000)
-    
-    # Save to base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_png = buffer.getvalue()
-    buffer.close()
-    plt.close()
-    
-    graphic = base64.b64encode(image_png).decode('utf-8')
-    
-    return graphic
+    return [history[month] for month in months]
 
-def generate_balance_chart(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+def get_monthly_expenses(user_id, year=None):
+    year = year or datetime.now().year
     
+    return [
+        {'month': calendar.month_abbr[row['period'].month], 'amount': row['expenses']}
+        for row in monthly_history(user_id, date(year, 1, 1), date(year, 12, 31))
+    ]
+
+def get_current_month_balance(user_id):
     today = datetime.now()
-    month = today.month
-    year = today.year
-    
-    # Get all days in the current month
-    first_day = datetime(year, month, 1)
-    last_day = datetime(year, month, calendar.monthrange(year, month)[1])
-    
-    # Get all funds and expenses for the month
-    cursor.execute(
-        "SELECT date, amount FROM funds WHERE user_id = %s AND date BETWEEN %s AND %s ORDER BY date",
-        (user_id, first_day, last_day)
-    )
-    funds = cursor.fetchall()
-    
-    cursor.execute(
-        "SELECT date, amount FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s ORDER BY date",
-        (user_id, first_day, last_day)
-    )
-    expenses = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
-    
-    # Combine funds and expenses
-    transactions = []
-    for fund in funds:
-        transactions.append({
-            'date': fund['date'],
-            'amount': float(fund['amount']),
-            'type': 'fund'
-        })
-    
-    for expense in expenses:
-        transactions.append({
-            'date': expense['date'],
-            'amount': float(expense['amount']),
-            'type': 'expense'
-        })
-    
-    # Sort transactions by date
-    transactions.sort(key=lambda x: x['date'])
-    
-    # Calculate running balance
-    dates = []
-    balances = []
-    running_balance = 0
-    
-    current_date = first_day
-    while current_date <= min(last_day, today):
-        # Calculate balance for this date
-        for transaction in transactions:
-            if transaction['date'].strftime('%Y-%m-%d') == current_date.strftime('%Y-%m-%d'):
-                if transaction['type'] == 'fund':
-                    running_balance += transaction['amount']
-                else:
-                    running_balance -= transaction['amount']
-        
-        # Add to balance trend
-        dates.append(current_date.strftime('%b %d'))
-        balances.append(running_balance)
-        
-        # Move to next date
-        current_date += timedelta(days=1)
-    
-    # Create line chart
-    plt.figure(figsize=(10, 6))
-    plt.plot(dates, balances, marker='o', linestyle='-', color='#10b981')
-    
-    # Add data labels for first and last points
-    if balances:
-        plt.text(0, balances[0], f'₹{int(balances[0])}', ha='left', va='bottom')
-        plt.text(len(dates)-1, balances[-1], f'₹{int(balances[-1])}', ha='right', va='bottom')
+    first_day = date(today.year, today.month, 1)
     
-    plt.title('Balance Trend')
-    plt.xlabel('Date')
-    plt.ylabel('Balance (₹)')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    
-    # Rotate x-axis labels for better readability
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    # Save to base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_png = buffer.getvalue()
-    buffer.close()
-    plt.close()
-    
-    graphic = base64.b64encode(image_png).decode('utf-8')
-    
-    return graphic
+    return balance_series(user_id, first_day, today.date())
 
-def generate_top_expenses_chart(user_id):
-    conn = get_db_connection()
+def get_top_expenses(user_id):
+    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     
     today = datetime.now()
@@ -481,62 +1066,484 @@ def generate_top_expenses_chart(user_id):
     last_day = datetime(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
     
     cursor.execute(
-        "SELECT category, description, amount FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s ORDER BY amount DESC LIMIT 5",
+        f"SELECT {PROJECTIONS['top_expenses']} FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s ORDER BY amount DESC LIMIT 5",
         (user_id, first_day, last_day)
     )
     expenses = cursor.fetchall()
     
     cursor.close()
-    conn.close()
     
-    if not expenses:
-        return None
+    return expenses
+
+def generate_category_chart(user_id, format='png'):
+    return render_category_chart(get_category_totals(user_id), format)
+
+def generate_monthly_chart(user_id, format='png'):
+    return render_monthly_chart(get_monthly_expenses(user_id), format)
+
+def generate_balance_chart(user_id, format='png'):
+    dates, balances = get_current_month_balance(user_id)
+    return render_balance_chart(dates, balances, format)
+
+def generate_top_expenses_chart(user_id, format='png'):
+    return render_top_expenses_chart(get_top_expenses(user_id), format)
+
+def get_chart_series(kind, user_id):
+    """Return the data behind a chart as {'labels': [...], 'values': [...]}.
+
+    Values are rupees, converted from paise only here at the edge.
+    """
+    if kind == 'category':
+        categories = get_category_totals(user_id)
+        labels = [category['category'] for category in categories]
+        values = [category['total'] for category in categories]
+    elif kind == 'monthly':
+        monthly_data = get_monthly_expenses(user_id)
+        labels = [data['month'] for data in monthly_data]
+        values = [data['amount'] for data in monthly_data]
+    elif kind == 'balance':
+        labels, values = get_current_month_balance(user_id)
+    elif kind == 'top':
+        expenses = get_top_expenses(user_id)
+        labels = [expense['description'] if expense['description'] else expense['category'] for expense in expenses]
+        values = [to_paise(expense['amount']) for expense in expenses]
+    else:
+        raise ValueError(f'Unknown chart kind: {kind}')
+    
+    return {'labels': labels, 'values': [value / 100 for value in values]}
+
+# Chart cache
+class ChartCache:
+    """LRU cache of rendered charts, bounded by the total size of the images."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        size = len(value) if value else 0
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                old = self._entries.pop(key)
+                self.current_bytes -= len(old) if old else 0
+            
+            self._entries[key] = value
+            self.current_bytes += size
+            
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted) if evicted else 0
+
+chart_cache = ChartCache(int(os.environ.get('CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024)))
+
+_missing = object()
+
+def get_data_version(user_id):
+    """Return (version, updated_at) for the user's data, bumped on every expense or fund write."""
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
     
-    # Create bar chart
-    labels = []
-    amounts = []
+    cursor.execute("SELECT version, updated_at FROM user_data_versions WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
     
-    for expense in expenses:
-        description = expense['description'] if expense['description'] else expense['category']
-        labels.append(description[:15] + '...' if len(description) > 15 else description)
-        amounts.append(float(expense['amount']))
+    cursor.close()
     
-    plt.figure(figsize=(10, 6))
-    bars = plt.barh(labels, amounts, color='#f43f5e')
+    if not row:
+        return 0, None
+    return row['version'], row['updated_at']
+
+def bump_data_version(cursor, user_id):
+    # Runs inside the caller's transaction so the version moves with the write
+    cursor.execute(
+        "INSERT INTO user_data_versions (user_id, version) VALUES (%s, 1) ON DUPLICATE KEY UPDATE version = version + 1",
+        (user_id,)
+    )
+
+def bump_data_versions(cursor, first_id, last_id):
+    # Like bump_data_version, for every user in an id range whose rollups a
+    # maintenance job has just rewritten
+    cursor.execute(
+        "INSERT INTO user_data_versions (user_id, version) SELECT id, 1 FROM users WHERE id BETWEEN %s AND %s "
+        "ON DUPLICATE KEY UPDATE version = version + 1",
+        (first_id, last_id)
+    )
+
+def chart_cache_key(user_id, kind, version):
+    # Charts also depend on today's date (e.g. the balance trend ends today)
+    return (user_id, kind, version, date.today())
+
+def cached_chart(user_id, kind, version, render, placeholder=None):
+    key = chart_cache_key(user_id, kind, version)
+    
+    chart = chart_cache.get(key, _missing)
+    if chart is not _missing:
+        return chart
+    
+    # Wait for a render already started on the process pool
+    with _pending_renders_lock:
+        future = _pending_renders.get(key)
+    if future is not None:
+        try:
+            return future.result(timeout=CHART_RENDER_TIMEOUT)
+        except Exception:
+            if placeholder is not None:
+                return placeholder()
+    
+    chart = render()
+    chart_cache.set(key, chart)
+    
+    return chart
+
+# Parallel chart rendering
+# With CHART_RENDER_BACKEND=process the dashboard submits its charts to a pool of
+# warm worker processes while the page is being sent, and the image requests
+# pick up the results from the chart cache.
+CHART_RENDER_BACKEND = os.environ.get('CHART_RENDER_BACKEND', 'inline')
+CHART_RENDER_WORKERS = int(os.environ.get('CHART_RENDER_WORKERS', 4))
+CHART_RENDER_TIMEOUT = float(os.environ.get('CHART_RENDER_TIMEOUT', 10))
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+_pending_renders = {}
+_pending_renders_lock = threading.Lock()
+
+def _warm_render_worker():
+    # Load matplotlib's fonts and Agg backend once per worker instead of per chart
+    render_monthly_chart([{'month': calendar.month_abbr[1], 'amount': 0}])
+
+def get_render_pool():
+    global _render_pool
     
-    # Add data labels
-    for i, bar in enumerate(bars):
-        width = bar.get_width()
-        plt.text(width + 50, bar.get_y() + bar.get_height()/2, f'₹{int(width)}', ha='left', va='center')
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=CHART_RENDER_WORKERS, initializer=_warm_render_worker)
     
-    plt.title('Top Expenses')
-    plt.xlabel('Amount (₹)')
-    plt.ylabel('Description')
-    plt.tight_layout()
+    return _render_pool
+
+def _finish_render(key, future):
+    # Cache first, so a request that no longer sees the future finds the chart
+    if not future.cancelled() and future.exception() is None:
+        chart_cache.set(key, future.result())
+    
+    with _pending_renders_lock:
+        if _pending_renders.get(key) is future:
+            del _pending_renders[key]
+
+def submit_chart_renders(user_id, version, jobs):
+    """Start rendering charts on the process pool.
+
+    `jobs` maps a chart key such as 'category.png' to a (render function, args)
+    pair; charts that are already cached or in flight are skipped.
+    """
+    pool = get_render_pool()
     
-    # Save to base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_png = buffer.getvalue()
-    buffer.close()
-    plt.close()
+    for kind, (render, args) in jobs.items():
+        key = chart_cache_key(user_id, kind, version)
+        
+        with _pending_renders_lock:
+            if key in _pending_renders or chart_cache.get(key, _missing) is not _missing:
+                continue
+            
+            future = pool.submit(render, *args)
+            _pending_renders[key] = future
+        
+        # Outside the lock: the callback runs right away if the render already finished
+        future.add_done_callback(lambda future, key=key: _finish_render(key, future))
+
+# Concurrent queries
+# The dashboard view is async: with DASHBOARD_QUERIES=concurrent its four
+# independent queries run side by side on worker threads, each in its own app
+# context and so on its own pooled connection, and the page waits for the
+# slowest query instead of their sum. That holds four connections per dashboard
+# load instead of one, so it is off by default ("serial"); only turn it on
+# when the pool and max_connections have room for it.
+DASHBOARD_QUERIES = os.environ.get('DASHBOARD_QUERIES', 'serial')
+DASHBOARD_QUERY_WORKERS = int(os.environ.get('DASHBOARD_QUERY_WORKERS', 8))
+
+_query_pool = ThreadPoolExecutor(max_workers=DASHBOARD_QUERY_WORKERS, thread_name_prefix='query')
+
+def fetch_chunks(cursor, size=None):
+    # Yield a cursor's rows in lists of up to `size`
+    size = size or TransactionBatch.CHUNK_SIZE
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+async def run_query(fn, *args):
+    """Run a blocking database function on the query pool and await its result."""
+    app = current_app._get_current_object()
     
-    graphic = base64.b64encode(image_png).decode('utf-8')
+    def call():
+        with app.app_context():
+            return fn(*args)
     
-    return graphic
+    return await asyncio.get_running_loop().run_in_executor(_query_pool, call)
+
+# Dashboard snapshot
+class DashboardSnapshot:
+    """Everything the dashboard shows, derived from one fetch of the user's rows.
+
+    The current month of expenses and funds is read in a single query and
+    packed into a TransactionBatch; totals, category breakdown and the balance
+    trend are computed on its arrays. Only the rows the page shows are kept as
+    dicts: the first page of expenses, the top five and the funds. The previous
+    month's savings come from its monthly_savings rollup.
+    Money properties are integer paise; templates format them with |rupees.
+    """
+
+    TOP_EXPENSES = 5
+
+    def __init__(self, user_id, today=None):
+        self.user_id = user_id
+        self.today = today or datetime.now()
+        
+        year = self.today.year
+        month = self.today.month
+        self.first_day = date(year, month, 1)
+        self.last_day = date(year, month, calendar.monthrange(year, month)[1])
+        
+        self.previous_month = month - 1 if month > 1 else 12
+        self.previous_year = year if month > 1 else year - 1
+        
+        self.batch = None
+        self.recent_expenses = []
+        self.funds = []
+        self.monthly_data = []
+        self.previous_month_savings = 0
+        self._top = []
+
+    def _rows(self, chunks):
+        # Stream rows into the batch, keeping dicts only for what is displayed
+        sequence = 0
+        for rows in chunks:
+            for kind, id_, day, category, amount, description in rows:
+                if kind == 'fund':
+                    self.funds.append({'id': id_, 'date': day, 'amount': amount})
+                else:
+                    row = {'id': id_, 'date': day, 'category': category, 'amount': amount, 'description': description}
+                    # One extra row tells whether there is a next page
+                    if len(self.recent_expenses) <= EXPENSES_PAGE_SIZE:
+                        self.recent_expenses.append(row)
+                    sequence += 1
+                    entry = (amount, -sequence, row)
+                    if len(self._top) < self.TOP_EXPENSES:
+                        heapq.heappush(self._top, entry)
+                    elif entry > self._top[0]:
+                        heapq.heapreplace(self._top, entry)
+                
+                yield kind == 'fund', day, category, amount
+
+    def load(self):
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"""
+            SELECT 'expense' AS type, {PROJECTIONS['expense_list']}
+            FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s
+            UNION ALL
+            SELECT 'fund' AS type, {PROJECTIONS['fund_list']}
+            FROM funds WHERE user_id = %s AND date BETWEEN %s AND %s
+            ORDER BY date DESC, id DESC
+            """,
+            (self.user_id, self.first_day, self.last_day,
+             self.user_id, self.first_day, self.last_day)
+        )
+        self.batch = TransactionBatch.from_rows(self._rows(fetch_chunks(cursor)))
+        
+        cursor.close()
+        
+        self.monthly_data = self._monthly_data()
+        self.previous_month_savings = self._previous_month_savings()
+        
+        return self
+
+    async def load_async(self):
+        """Like load(), but the expenses, funds, monthly totals and previous
+        month's rollup are queried at the same time, each on its own pooled
+        connection, so up to four connections are held per call.
+
+        The month summary is computed from the expense and fund rows, so it
+        needs no query of its own.
+        """
+        # Hand back the request's own connection first: holding it while the
+        # workers wait for theirs could drain the pool under load
+        release_db()
+        
+        expenses, funds, self.monthly_data, self.previous_month_savings = await asyncio.gather(
+            run_query(self._transaction_batch, f"SELECT 'expense' AS type, {PROJECTIONS['expense_list']} FROM expenses"),
+            run_query(self._transaction_batch, f"SELECT 'fund' AS type, {PROJECTIONS['fund_list']} FROM funds"),
+            run_query(self._monthly_data),
+            run_query(self._previous_month_savings)
+        )
+        self.batch = TransactionBatch.concat([expenses, funds])
+        
+        return self
+
+    def _transaction_batch(self, select):
+        # Expense and fund rows fill different attributes in _rows, so the two
+        # queries can stream into their own batches on separate threads
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"{select} WHERE user_id = %s AND date BETWEEN %s AND %s ORDER BY date DESC, id DESC",
+            (self.user_id, self.first_day, self.last_day)
+        )
+        batch = TransactionBatch.from_rows(self._rows(fetch_chunks(cursor)))
+        
+        cursor.close()
+        
+        return batch
+
+    def _monthly_data(self):
+        return get_monthly_expenses(self.user_id, self.today.year)
+
+    def _previous_month_savings(self):
+        # monthly_savings is kept up to date on every write, so this is one primary-key lookup
+        return get_monthly_rollup(self.user_id, self.previous_year, self.previous_month)['savings']
+
+    @property
+    def total_expenses(self):
+        return self.batch.total(self.first_day, self.last_day)
+
+    @property
+    def total_funds(self):
+        return self.batch.total(self.first_day, self.last_day, funds=True)
+
+    @property
+    def remaining_balance(self):
+        return self.total_funds - self.total_expenses
+
+    @property
+    def remaining_days(self):
+        return (self.last_day - self.today.date()).days + 1
+
+    @property
+    def daily_spendable(self):
+        return round(self.remaining_balance / self.remaining_days) if self.remaining_days > 0 else 0
+
+    @property
+    def monthly_summary(self):
+        return {
+            'month': calendar.month_name[self.today.month],
+            'year': self.today.year,
+            'total_expenses': self.total_expenses,
+            'total_funds': self.total_funds,
+            'savings': self.remaining_balance
+        }
+
+    @property
+    def category_totals(self):
+        return self.batch.category_totals(self.first_day, self.last_day)
+
+    @property
+    def top_expenses(self):
+        return [row for _, _, row in sorted(self._top, reverse=True)]
+
+    @property
+    def balance_series(self):
+        end = min(self.last_day, self.today.date())
+        balances = self.batch.balance_series(self.first_day, end)
+        return day_labels(self.first_day, end), balances
+
+def build_dashboard_snapshot(user_id):
+    return DashboardSnapshot(user_id).load()
+
+async def build_dashboard_snapshot_async(user_id):
+    if DASHBOARD_QUERIES == 'concurrent':
+        return await DashboardSnapshot(user_id).load_async()
+    return build_dashboard_snapshot(user_id)
+
+# Password hashing
+# bcrypt is slow on purpose, so hashes are computed on a small dedicated thread
+# pool (bcrypt releases the GIL) instead of on the request thread. At most
+# BCRYPT_WORKERS + BCRYPT_QUEUE_LIMIT calls are in flight; beyond that new
+# logins are turned away with a 503 rather than queueing behind each other.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', 2))
+BCRYPT_QUEUE_LIMIT = int(os.environ.get('BCRYPT_QUEUE_LIMIT', 8))
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    """Runs bcrypt on a pool of `workers` threads at cost factor `rounds`.
+
+    A semaphore bounds the calls running or waiting to `workers + queue_limit`;
+    beyond that hash() and verify() raise PasswordHasherBusy, which the auth
+    routes turn into a 503.
+    """
+
+    def __init__(self, rounds, workers, queue_limit):
+        self.rounds = rounds
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._pool = None
+        self._lock = threading.Lock()
+    
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        
+        try:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        
+        future.add_done_callback(lambda future: self._slots.release())
+        return future.result()
+    
+    def hash(self, password):
+        hashed = self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        return hashed.decode('utf-8')
+    
+    def verify(self, password, hashed):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+    
+    def needs_rehash(self, hashed):
+        # A bcrypt hash looks like $2b$12$...; the second field is its cost factor
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+password_hasher = PasswordHasher(BCRYPT_ROUNDS, BCRYPT_WORKERS, BCRYPT_QUEUE_LIMIT)
+
+def password_hasher_busy(template):
+    response = make_response(render_template(template, error='Too many sign-in attempts right now, please try again in a moment'), 503)
+    response.headers['Retry-After'] = '1'
+    return response
 
 # Routes
-@app.route('/')
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     error = None
     
@@ -547,33 +1554,47 @@ def login():
         if not email or not password:
             error = 'Email and password are required'
         else:
-            conn = get_db_connection()
+            conn = get_db()
             cursor = conn.cursor(dictionary=True)
             
-            cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+            cursor.execute(f"SELECT {PROJECTIONS['login']} FROM users WHERE email = %s", (email,))
             user = cursor.fetchone()
             
-            if user and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-                session['user_id'] = user['id']
-                session['user_name'] = user['name']
-                session['user_email'] = user['email']
+            try:
+                valid = user is not None and password_hasher.verify(password, user['password'])
+            except PasswordHasherBusy:
+                cursor.close()
+                return password_hasher_busy('login.html')
+            
+            if valid:
+                # Upgrade hashes made with an older cost factor while we have the password
+                if password_hasher.needs_rehash(user['password']):
+                    try:
+                        cursor.execute(
+                            "UPDATE users SET password = %s WHERE id = %s",
+                            (password_hasher.hash(password), user['id'])
+                        )
+                        conn.commit()
+                    except PasswordHasherBusy:
+                        pass
+                
+                regenerate_session()
+                cache_user_profile(user)
                 
                 cursor.close()
-                conn.close()
                 
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('main.dashboard'))
             else:
                 error = 'Invalid email or password'
             
             cursor.close()
-            conn.close()
     
     return render_template('login.html', error=error)
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     error = None
     
@@ -585,92 +1606,219 @@ def register():
         if not name or not email or not password:
             error = 'All fields are required'
         else:
-            conn = get_db_connection()
+            conn = get_db()
             cursor = conn.cursor(dictionary=True)
             
-            cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+            cursor.execute("SELECT 1 FROM users WHERE email = %s LIMIT 1", (email,))
             if cursor.fetchone():
                 error = 'User with this email already exists'
             else:
-                hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+                try:
+                    hashed_password = password_hasher.hash(password)
+                except PasswordHasherBusy:
+                    cursor.close()
+                    return password_hasher_busy('register.html')
                 
                 cursor.execute(
                     "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
-                    (name, email, hashed_password.decode('utf-8'))
+                    (name, email, hashed_password)
                 )
                 conn.commit()
                 
                 user_id = cursor.lastrowid
                 
-                session['user_id'] = user_id
-                session['user_name'] = name
-                session['user_email'] = email
+                regenerate_session()
+                cache_user_profile({'id': user_id, 'name': name, 'email': email})
                 
                 cursor.close()
-                conn.close()
                 
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('main.dashboard'))
             
             cursor.close()
-            conn.close()
     
     return render_template('register.html', error=error)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/dashboard')
-def dashboard():
+@bp.route('/dashboard')
+async def dashboard():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user = get_user_data()
-    expenses = get_current_month_expenses(session['user_id'])
-    funds = get_current_month_funds(session['user_id'])
-    monthly_summary = get_monthly_summary(session['user_id'])
-    previous_month_savings = get_previous_month_savings(session['user_id'])
-    
-    # Calculate totals
-    total_expenses = sum(float(expense['amount']) for expense in expenses)
-    total_funds = sum(float(fund['amount']) for fund in funds)
-    remaining_balance = total_funds - total_expenses
-    
-    # Calculate daily spendable amount
-    today = datetime.now()
-    last_day_of_month = calendar.monthrange(today.year, today.month)[1]
-    remaining_days = last_day_of_month - today.day + 1
-    daily_spendable = remaining_balance / remaining_days if remaining_days > 0 else 0
+    snapshot = await build_dashboard_snapshot_async(session['user_id'])
+    
+    # Charts are fetched by the browser, either as images from /charts/<kind>.png
+    # or as JSON series from /api/charts/<kind> drawn client-side
+    chart_mode = request.args.get('charts', CHART_MODE)
+    category_chart = url_for('main.chart_image', kind='category', format='png') if snapshot.category_totals else None
+    monthly_chart = url_for('main.chart_image', kind='monthly', format='png')
+    balance_chart = url_for('main.chart_image', kind='balance', format='png')
+    top_expenses_chart = url_for('main.chart_image', kind='top', format='png') if snapshot.top_expenses else None
+    
+    if CHART_RENDER_BACKEND == 'process' and chart_mode != 'client':
+        version, _ = get_data_version(session['user_id'])
+        submit_chart_renders(session['user_id'], version, {
+            'category.png': (render_category_chart, (snapshot.category_totals,)),
+            'monthly.png': (render_monthly_chart, (snapshot.monthly_data,)),
+            'balance.png': (render_balance_chart, snapshot.balance_series),
+            'top.png': (render_top_expenses_chart, (snapshot.top_expenses,))
+        })
     
-    # Generate charts
-    category_chart = generate_category_chart(session['user_id'])
-    monthly_chart = generate_monthly_chart(session['user_id'])
-    balance_chart = generate_balance_chart(session['user_id'])
-    top_expenses_chart = generate_top_expenses_chart(session['user_id'])
+    # Only the first page of expenses is rendered; the rest load on scroll
+    expenses = snapshot.recent_expenses[:EXPENSES_PAGE_SIZE]
+    next_before = page_cursor(snapshot.recent_expenses, EXPENSES_PAGE_SIZE)
+    next_expenses_url = url_for('main.list_expenses', before=next_before, start=snapshot.first_day.isoformat()) if next_before else None
     
     return render_template(
         'dashboard.html',
         user=user,
         expenses=expenses,
-        funds=funds,
-        total_expenses=total_expenses,
-        total_funds=total_funds,
-        remaining_balance=remaining_balance,
-        daily_spendable=daily_spendable,
-        remaining_days=remaining_days,
-        monthly_summary=monthly_summary,
-        previous_month_savings=previous_month_savings,
+        next_expenses_url=next_expenses_url,
+        funds=snapshot.funds,
+        total_expenses=snapshot.total_expenses,
+        total_funds=snapshot.total_funds,
+        remaining_balance=snapshot.remaining_balance,
+        daily_spendable=snapshot.daily_spendable,
+        remaining_days=snapshot.remaining_days,
+        monthly_summary=snapshot.monthly_summary,
+        previous_month_savings=snapshot.previous_month_savings,
         category_chart=category_chart,
         monthly_chart=monthly_chart,
         balance_chart=balance_chart,
-        top_expenses_chart=top_expenses_chart
+        top_expenses_chart=top_expenses_chart,
+        chart_mode=chart_mode
+    )
+
+CHART_GENERATORS = {
+    'category': generate_category_chart,
+    'monthly': generate_monthly_chart,
+    'balance': generate_balance_chart,
+    'top': generate_top_expenses_chart
+}
+
+CHART_MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+# 'server' renders PNGs with matplotlib, 'client' draws JSON series in the browser
+CHART_MODE = os.environ.get('CHART_MODE', 'server')
+
+def chart_response(user_id, key, mimetype, build, placeholder=None):
+    # Conditional response for chart data: 304 if the client's copy is current
+    version, updated_at = get_data_version(user_id)
+    
+    # Charts change on writes and when the day rolls over
+    today = date.today()
+    start_of_today = datetime(today.year, today.month, today.day)
+    last_modified = max(updated_at, start_of_today) if updated_at else start_of_today
+    etag = f'{user_id}-{version}-{today.isoformat()}-{key}'
+    
+    response = make_response()
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response.status_code = 304
+        return response
+    
+    body = cached_chart(user_id, key, version, build, placeholder)
+    if body is None:
+        abort(404)
+    
+    response.set_data(body)
+    response.mimetype = mimetype
+    
+    return response
+
+@bp.route('/charts/<kind>.<format>')
+def chart_image(kind, format):
+    if 'user_id' not in session:
+        abort(401)
+    
+    if kind not in CHART_GENERATORS or format not in CHART_MIMETYPES:
+        abort(404)
+    
+    user_id = session['user_id']
+    return chart_response(
+        user_id, f'{kind}.{format}', CHART_MIMETYPES[format],
+        lambda: CHART_GENERATORS[kind](user_id, format),
+        lambda: render_placeholder_chart(kind, format)
     )
 
-@app.route('/add_expense', methods=['POST'])
+@bp.route('/api/charts/<kind>')
+def chart_data(kind):
+    if 'user_id' not in session:
+        abort(401)
+    
+    if kind not in CHART_GENERATORS:
+        abort(404)
+    
+    user_id = session['user_id']
+    return chart_response(
+        user_id, f'{kind}.json', 'application/json',
+        lambda: json.dumps(get_chart_series(kind, user_id))
+    )
+
+# Month-by-month history, answered from the rollups for purged months
+HISTORY_MAX_MONTHS = int(os.environ.get('HISTORY_MAX_MONTHS', 120))
+
+def parse_month_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        abort(400, f'{name} must be in YYYY-MM format')
+
+@bp.route('/api/history')
+def history():
+    if 'user_id' not in session:
+        abort(401)
+    
+    today = date.today()
+    end = parse_month_arg('end', today.replace(day=1))
+    if end.year == date.max.year and end.month == 12:
+        abort(400, 'end must be before 9999-12')
+    # Twelve months back by default, but never before year 1
+    start_index = max(month_index(end) - 11, month_index(date.min))
+    start = parse_month_arg('start', date(start_index // 12, start_index % 12 + 1, 1))
+    
+    months = month_index(end) - month_index(start) + 1
+    if months < 1:
+        abort(400, 'start must not be after end')
+    if months > HISTORY_MAX_MONTHS:
+        abort(400, f'At most {HISTORY_MAX_MONTHS} months can be requested at once')
+    
+    end = end.replace(day=calendar.monthrange(end.year, end.month)[1])
+    user_id = session['user_id']
+    
+    def build():
+        # Amounts are rupees in the response, converted from paise here
+        return json.dumps({'months': [
+            {
+                'month': row['period'].isoformat()[:7],
+                'expenses': row['expenses'] / 100,
+                'funds': row['funds'] / 100,
+                'savings': (row['funds'] - row['expenses']) / 100,
+                'categories': {category: total / 100 for category, total in row['categories'].items()}
+            }
+            for row in monthly_history(user_id, start, end, by_category=True)
+        ]})
+    
+    return chart_response(user_id, f'history-{start:%Y-%m}-{end:%Y-%m}.json', 'application/json', build)
+
+@bp.route('/add_expense', methods=['POST'])
 def add_expense():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     category = request.form.get('category')
     amount = request.form.get('amount')
@@ -678,166 +1826,1176 @@ def add_expense():
     
     if not category or not amount:
         flash('Category and amount are required', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     try:
-        amount = float(amount)
-    except ValueError:
+        amount = to_paise(amount)
+    except (ValueError, ArithmeticError):
         flash('Amount must be a number', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
+    today = date.today()
     cursor.execute(
         "INSERT INTO expenses (user_id, date, category, amount, description) VALUES (%s, %s, %s, %s, %s)",
-        (session['user_id'], datetime.now().strftime('%Y-%m-%d'), category, amount, description)
+        (session['user_id'], today, category, from_paise(amount), description)
     )
+    add_to_monthly_rollup(cursor, session['user_id'], today, expenses=amount)
+    add_to_category_rollup(cursor, session['user_id'], [(today, category, amount)])
+    add_to_daily_totals(cursor, session['user_id'], [(today, category, amount, 0, 1)])
+    bump_data_version(cursor, session['user_id'])
     conn.commit()
     
     cursor.close()
-    conn.close()
     
     flash('Expense added successfully', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/add_fund', methods=['POST'])
+@bp.route('/add_fund', methods=['POST'])
 def add_fund():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     amount = request.form.get('amount')
     
     if not amount:
         flash('Amount is required', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     try:
-        amount = float(amount)
-    except ValueError:
+        amount = to_paise(amount)
+    except (ValueError, ArithmeticError):
         flash('Amount must be a number', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
+    today = date.today()
     cursor.execute(
         "INSERT INTO funds (user_id, date, amount) VALUES (%s, %s, %s)",
-        (session['user_id'], datetime.now().strftime('%Y-%m-%d'), amount)
+        (session['user_id'], today, from_paise(amount))
     )
+    add_to_monthly_rollup(cursor, session['user_id'], today, funds=amount)
+    add_to_daily_totals(cursor, session['user_id'], [(today, FUNDS_CATEGORY, 0, amount, 1)])
+    bump_data_version(cursor, session['user_id'])
     conn.commit()
     
     cursor.close()
-    conn.close()
     
     flash('Fund added successfully', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-# Monthly cleanup task
-def cleanup_old_data():
-    conn = get_db_connection()
+# Bulk expense import
+BULK_INSERT_BATCH_SIZE = 1000
+BULK_MAX_REPORTED_ERRORS = 1000
+# Largest value a DECIMAL(10, 2) amount column holds
+MAX_AMOUNT = Decimal('99999999.99')
+
+def text_field(fields, name):
+    # NDJSON values can be numbers, lists or objects; only strings are accepted
+    value = fields.get(name)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f'{name.capitalize()} must be a string')
+    return value.strip()
+
+def parse_expense_fields(fields):
+    # Validate one imported row and return the values to insert
+    expense_date = text_field(fields, 'date')
+    category = text_field(fields, 'category')
+    amount = str(fields.get('amount') or '').strip()
+    description = text_field(fields, 'description')
+    
+    try:
+        expense_date = date.fromisoformat(expense_date)
+    except ValueError:
+        raise ValueError('Date must be in YYYY-MM-DD format')
+    
+    if not category:
+        raise ValueError('Category is required')
+    if len(category) > 50:
+        raise ValueError('Category must be at most 50 characters')
+    if len(description) > 255:
+        raise ValueError('Description must be at most 255 characters')
+    
+    try:
+        amount = Decimal(amount)
+    except InvalidOperation:
+        raise ValueError('Amount must be a number')
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError('Amount must be a positive number')
+    if amount > MAX_AMOUNT:
+        raise ValueError(f'Amount must be at most {MAX_AMOUNT}')
+    if amount.as_tuple().exponent < -2:
+        raise ValueError('Amount must have at most two decimal places')
+    
+    return expense_date, category, amount, description
+
+def read_csv_rows(lines):
+    # Yields (line number, fields dict); the first row is the header
+    reader = csv.DictReader(lines)
+    for fields in reader:
+        yield reader.line_num, fields
+
+def read_ndjson_rows(lines):
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, fields if isinstance(fields, dict) else None
+
+def parse_bulk_expenses(rows):
+    """Yield (line number, values, error) for each imported row."""
+    for line_number, fields in rows:
+        if fields is None:
+            yield line_number, None, 'Row must be a JSON object'
+            continue
+        try:
+            yield line_number, parse_expense_fields(fields), None
+        except ValueError as e:
+            yield line_number, None, str(e)
+
+@bp.route('/api/expenses/bulk', methods=['POST'])
+def bulk_import_expenses():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Login required'}), 401
+    
+    # Decode the request body line by line as it arrives
+    lines = (line.decode('utf-8-sig') for line in request.stream)
+    
+    if request.mimetype in ('text/csv', 'application/csv'):
+        rows = read_csv_rows(lines)
+    elif request.mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        rows = read_ndjson_rows(lines)
+    else:
+        return jsonify({'error': 'Body must be CSV (text/csv) or NDJSON (application/x-ndjson)'}), 415
+    
+    user_id = session['user_id']
+    conn = get_db()
     cursor = conn.cursor()
     
+    inserted = 0
+    failed = 0
+    errors = []
+    batch = []
+    month_totals = {}
+    day_totals = {}
+    
+    def flush():
+        cursor.executemany(
+            "INSERT INTO expenses (user_id, date, category, amount, description) VALUES (%s, %s, %s, %s, %s)",
+            batch
+        )
+        batch.clear()
+    
     try:
-        # Get current date
-        today = datetime.now()
+        for line_number, values, error in parse_bulk_expenses(rows):
+            if error:
+                failed += 1
+                if len(errors) < BULK_MAX_REPORTED_ERRORS:
+                    errors.append({'line': line_number, 'error': error})
+                continue
+            
+            expense_date, category, amount, description = values
+            batch.append((user_id, expense_date, category, amount, description))
+            month = expense_date.replace(day=1)
+            month_totals[month] = month_totals.get(month, 0) + to_paise(amount)
+            total, count = day_totals.get((expense_date, category), (0, 0))
+            day_totals[(expense_date, category)] = (total + to_paise(amount), count + 1)
+            inserted += 1
+            
+            if len(batch) >= BULK_INSERT_BATCH_SIZE:
+                flush()
         
-        # Calculate date two months ago
-        two_months_ago = today.replace(day=1)
-        if two_months_ago.month <= 2:
-            two_months_ago = two_months_ago.replace(year=two_months_ago.year - 1)
-            two_months_ago = two_months_ago.replace(month=two_months_ago.month + 10)
-        else:
-            two_months_ago = two_months_ago.replace(month=two_months_ago.month - 2)
+        if batch:
+            flush()
         
-        # Before deleting, ensure monthly savings are calculated and stored
-        cursor.execute("SELECT DISTINCT user_id FROM expenses WHERE date < %s", (two_months_ago,))
-        users = cursor.fetchall()
+        for month, total in month_totals.items():
+            add_to_monthly_rollup(cursor, user_id, month, expenses=total)
+        if day_totals:
+            category_totals = {}
+            for (day, category), (total, _) in day_totals.items():
+                key = (day.replace(day=1), category)
+                category_totals[key] = category_totals.get(key, 0) + total
+            add_to_category_rollup(cursor, user_id, [
+                (month, category, total) for (month, category), total in category_totals.items()
+            ])
+            add_to_daily_totals(cursor, user_id, [
+                (day, category, total, 0, count)
+                for (day, category), (total, count) in day_totals.items()
+            ])
+        if inserted:
+            bump_data_version(cursor, user_id)
         
-        for user in users:
-            user_id = user[0]
+        conn.commit()
+    except (mysql.connector.Error, UnicodeDecodeError, csv.Error) as e:
+        conn.rollback()
+        return jsonify({'error': f'Import failed, no rows were saved: {e}'}), 400
+    finally:
+        cursor.close()
+    
+    return jsonify({
+        'inserted': inserted,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors)
+    })
+
+# Transaction export
+EXPORT_FETCH_SIZE = 500
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f'{name} must be in YYYY-MM-DD format')
+
+def transactions_query(user_id, start=None, end=None, category=None):
+    # Build the combined expenses/funds query for the given filters
+    filters = "user_id = %s"
+    params = [user_id]
+    if start:
+        filters += " AND date >= %s"
+        params.append(start)
+    if end:
+        filters += " AND date <= %s"
+        params.append(end)
+    
+    query = f"SELECT 'expense' AS type, {PROJECTIONS['expense_list']} FROM expenses WHERE {filters}"
+    if category:
+        query += " AND category = %s"
+        params = params + [category]
+    else:
+        # Funds have no category, so they are only exported without a category filter
+        query += f" UNION ALL SELECT 'fund' AS type, {PROJECTIONS['fund_list']} FROM funds WHERE {filters}"
+        params = params + params
+    
+    return query + " ORDER BY date, id", params
+
+def format_csv_rows(rows, header=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    return buffer.getvalue()
+
+def format_ndjson_rows(rows):
+    return ''.join(
+        json.dumps({
+            'type': type_, 'id': id_, 'date': day.isoformat(), 'category': category,
+            'amount': float(amount), 'description': description
+        }) + '\n'
+        for type_, id_, day, category, amount, description in rows
+    )
+
+EXPORT_COLUMNS = ['type', 'id', 'date', 'category', 'amount', 'description']
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+@bp.route('/export/transactions.<format>')
+def export_transactions(format):
+    if 'user_id' not in session:
+        return redirect(url_for('main.login'))
+    
+    if format not in EXPORT_MIMETYPES:
+        abort(404)
+    
+    query, params = transactions_query(
+        session['user_id'],
+        start=parse_date_arg('start'),
+        end=parse_date_arg('end'),
+        category=request.args.get('category')
+    )
+    
+    def generate():
+        # Unbuffered cursor: rows are pulled from the server fetchmany() at a time
+        cursor = get_db().cursor(buffered=False)
+        try:
+            cursor.execute(query, params)
+            if format == 'csv':
+                yield format_csv_rows([], header=EXPORT_COLUMNS)
+            
+            while True:
+                rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not rows:
+                    break
+                yield format_csv_rows(rows) if format == 'csv' else format_ndjson_rows(rows)
+        finally:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                # Client went away mid-export; the pool discards this connection
+                pass
+    
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_MIMETYPES[format])
+    response.headers['Content-Disposition'] = f'attachment; filename=transactions.{format}'
+    return response
+
+# Expense history
+EXPENSES_PAGE_SIZE = 50
+EXPENSES_MAX_PAGE_SIZE = 500
+
+def get_expenses_page(user_id, before=None, limit=EXPENSES_PAGE_SIZE, start=None):
+    """Return one page of expenses, newest first, and the cursor for the next page.
+
+    `before` is a (date, id) pair from a previous page; pages are found with a
+    seek on the (user_id, date) index, which InnoDB suffixes with id, instead
+    of an OFFSET scan.
+    """
+    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
+    
+    query = f"SELECT {PROJECTIONS['expense_list']} FROM expenses WHERE user_id = %s"
+    params = [user_id]
+    if start:
+        query += " AND date >= %s"
+        params.append(start)
+    if before:
+        query += " AND (date < %s OR (date = %s AND id < %s))"
+        params += [before[0], before[0], before[1]]
+    query += " ORDER BY date DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+    
+    cursor.execute(query, params)
+    expenses = cursor.fetchall()
+    
+    cursor.close()
+    
+    return expenses[:limit], page_cursor(expenses, limit)
+
+def page_cursor(expenses, limit):
+    # Cursor for the page after `expenses`, or None if this was the last page
+    if len(expenses) <= limit:
+        return None
+    last = expenses[limit - 1]
+    return f"{last['date'].isoformat()},{last['id']}"
+
+def parse_page_cursor(value):
+    try:
+        day, expense_id = value.split(',')
+        return date.fromisoformat(day), int(expense_id)
+    except ValueError:
+        abort(400, 'before must be in the form YYYY-MM-DD,id')
+
+@bp.route('/api/expenses')
+def list_expenses():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Login required'}), 401
+    
+    before = request.args.get('before')
+    limit = request.args.get('limit', EXPENSES_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, EXPENSES_MAX_PAGE_SIZE))
+    
+    expenses, next_before = get_expenses_page(
+        session['user_id'],
+        before=parse_page_cursor(before) if before else None,
+        limit=limit,
+        start=parse_date_arg('start')
+    )
+    
+    return jsonify({
+        'expenses': [
+            {
+                'id': expense['id'],
+                'date': expense['date'].isoformat(),
+                'category': expense['category'],
+                'amount': float(expense['amount']),
+                'description': expense['description']
+            }
+            for expense in expenses
+        ],
+        'next_before': next_before
+    })
+
+# Monthly cleanup task
+CLEANUP_BATCH_SIZE = int(os.environ.get('CLEANUP_BATCH_SIZE', 1000))
+CLEANUP_BATCH_SLEEP = float(os.environ.get('CLEANUP_BATCH_SLEEP', 0.1))
+CLEANUP_MAX_ROWS_PER_SECOND = float(os.environ.get('CLEANUP_MAX_ROWS_PER_SECOND', 0))
+
+def retention_cutoff(today=None):
+    # Raw rows are kept from the first day of the month two months back
+    today = today or date.today()
+    index = month_index(today) - 2
+    return date(index // 12, index % 12 + 1, 1)
+
+def rollup_before(conn, cursor, cutoff):
+    """Fill in monthly rollups for everything about to be purged, one range of
+    REBUILD_USER_BATCH_SIZE user ids per transaction.
+
+    Both rollup tables are maintained on every write, so this only backfills
+    months written before they existed. Existing rollups are kept as they are:
+    recomputing them after a partial purge would lose the purged rows. The
+    missing totals are read with plain SELECTs, which are consistent reads and
+    lock nothing, so live writes to expenses and funds never wait on this scan;
+    only the rollup rows being inserted are locked. Users in a range that gains
+    rollups get their data version bumped.
+    """
+    for first, last in user_id_ranges(cursor):
+        cursor.execute(
+            """
+            SELECT actual.user_id, actual.month, actual.year, actual.expenses, actual.funds
+            FROM (
+                SELECT user_id, month, year, SUM(expenses) AS expenses, SUM(funds) AS funds
+                FROM (
+                    SELECT user_id, YEAR(date) AS year, MONTH(date) AS month, amount AS expenses, 0 AS funds
+                    FROM expenses WHERE user_id BETWEEN %s AND %s AND date < %s
+                    UNION ALL
+                    SELECT user_id, YEAR(date) AS year, MONTH(date) AS month, 0 AS expenses, amount AS funds
+                    FROM funds WHERE user_id BETWEEN %s AND %s AND date < %s
+                ) AS transactions
+                GROUP BY user_id, year, month
+            ) AS actual
+            LEFT JOIN monthly_savings AS stored
+                ON stored.user_id = actual.user_id AND stored.month = actual.month AND stored.year = actual.year
+            WHERE stored.id IS NULL
+            """,
+            (first, last, cutoff, first, last, cutoff)
+        )
+        months = cursor.fetchall()
+        
+        cursor.execute(
+            """
+            SELECT actual.user_id, actual.year, actual.month, actual.category, actual.total
+            FROM (
+                SELECT user_id, YEAR(date) AS year, MONTH(date) AS month, category, SUM(amount) AS total
+                FROM expenses WHERE user_id BETWEEN %s AND %s AND date < %s
+                GROUP BY user_id, YEAR(date), MONTH(date), category
+            ) AS actual
+            LEFT JOIN monthly_category_totals AS stored
+                ON stored.user_id = actual.user_id AND stored.year = actual.year
+                AND stored.month = actual.month AND stored.category = actual.category
+            WHERE stored.user_id IS NULL
+            """,
+            (first, last, cutoff)
+        )
+        categories = cursor.fetchall()
+        
+        if months:
+            cursor.executemany(
+                """
+                INSERT INTO monthly_savings (user_id, month, year, total_expenses, total_funds, savings)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = id
+                """,
+                [(user_id, month, year, expenses, funds, funds - expenses) for user_id, month, year, expenses, funds in months]
+            )
+        if categories:
+            cursor.executemany(
+                """
+                INSERT INTO monthly_category_totals (user_id, year, month, category, total)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE total = monthly_category_totals.total
+                """,
+                categories
+            )
+        if months or categories:
+            bump_data_versions(cursor, first, last)
+        
+        conn.commit()
+
+def last_statement_lock_time(cursor):
+    # Lock wait of the previous statement on this connection, in seconds (MySQL 8.0.16+)
+    try:
+        cursor.execute(
+            "SELECT LOCK_TIME FROM performance_schema.events_statements_history "
+            "WHERE THREAD_ID = PS_CURRENT_THREAD_ID() AND SQL_TEXT LIKE 'DELETE%' "
+            "ORDER BY EVENT_ID DESC LIMIT 1"
+        )
+        row = cursor.fetchone()
+    except mysql.connector.Error:
+        return None
+    
+    return row[0] / 1e12 if row else None
+
+def purge_before(conn, cursor, table, cutoff):
+    """Delete rows older than cutoff in primary-key ranges of CLEANUP_BATCH_SIZE ids.
+
+    Only ids up to the largest one dated before the cutoff are visited. Progress
+    is checkpointed in purge_checkpoints after every batch, so a purge that is
+    interrupted resumes from the last finished range for the same cutoff.
+    """
+    cursor.execute(
+        "SELECT last_id FROM purge_checkpoints WHERE table_name = %s AND cutoff = %s",
+        (table, cutoff)
+    )
+    checkpoint = cursor.fetchone()
+    if checkpoint:
+        next_id = checkpoint[0] + 1
+    else:
+        cursor.execute(f"SELECT MIN(id) FROM {table}")
+        next_id = cursor.fetchone()[0]
+    
+    # Newer ids hold no rows to purge, so the walk stops at the last old one
+    cursor.execute(f"SELECT MAX(id) FROM {table} WHERE date < %s", (cutoff,))
+    max_id = cursor.fetchone()[0]
+    conn.commit()
+    
+    deleted = 0
+    if next_id is None or max_id is None:
+        return deleted
+    
+    while next_id <= max_id:
+        first_id = next_id
+        last_id = min(first_id + CLEANUP_BATCH_SIZE - 1, max_id)
+        started = time.monotonic()
+        
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id BETWEEN %s AND %s AND date < %s",
+            (first_id, last_id, cutoff)
+        )
+        rows = cursor.rowcount
+        lock_wait = last_statement_lock_time(cursor)
+        
+        cursor.execute(
+            "INSERT INTO purge_checkpoints (table_name, cutoff, last_id) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE cutoff = VALUES(cutoff), last_id = VALUES(last_id)",
+            (table, cutoff, last_id)
+        )
+        conn.commit()
+        
+        duration = time.monotonic() - started
+        deleted += rows
+        next_id = last_id + 1
+        
+        if rows:
+            lock_wait_text = f"{lock_wait:.3f}s" if lock_wait is not None else "n/a"
+            current_app.logger.info(f"Purged {rows} rows from {table} (ids {first_id}-{last_id}) in {duration:.3f}s, lock wait {lock_wait_text}")
+            pause_after_purge(rows, duration)
+    
+    return deleted
+
+def pause_after_purge(rows, duration):
+    # Throttle so a purge never hogs the table it deletes from
+    pause = CLEANUP_BATCH_SLEEP
+    if CLEANUP_MAX_ROWS_PER_SECOND:
+        pause = max(pause, rows / CLEANUP_MAX_ROWS_PER_SECOND - duration)
+    time.sleep(pause)
+
+def purge_daily_totals_before(conn, cursor, cutoff):
+    """Delete daily_totals rows older than cutoff, one range of REBUILD_USER_BATCH_SIZE user ids at a time.
+
+    daily_totals follows the raw tables' retention, so a rebuild reproduces it.
+    Bounding every batch by its user id range lets the (user_id, date, category)
+    primary key lead straight to the rows to delete, instead of rescanning and
+    locking the rows already kept for earlier users. Batches are logged and
+    throttled like purge_before's, and the last finished range is checkpointed
+    in purge_checkpoints (last_id holds a user id here), so an interrupted purge
+    resumes after it for the same cutoff.
+    """
+    cursor.execute(
+        "SELECT last_id FROM purge_checkpoints WHERE table_name = %s AND cutoff = %s",
+        ('daily_totals', cutoff)
+    )
+    checkpoint = cursor.fetchone()
+    done_through = checkpoint[0] if checkpoint else None
+    
+    deleted = 0
+    for first_id, last_id in user_id_ranges(cursor):
+        if done_through is not None and last_id <= done_through:
+            continue
+        
+        while True:
+            started = time.monotonic()
             
-            # Get month and year for data to be deleted
             cursor.execute(
-                "SELECT DISTINCT MONTH(date) as month, YEAR(date) as year FROM expenses WHERE user_id = %s AND date < %s",
-                (user_id, two_months_ago)
+                "DELETE FROM daily_totals WHERE user_id BETWEEN %s AND %s AND date < %s ORDER BY user_id, date, category LIMIT %s",
+                (first_id, last_id, cutoff, CLEANUP_BATCH_SIZE)
             )
-            periods = cursor.fetchall()
+            rows = cursor.rowcount
+            lock_wait = last_statement_lock_time(cursor)
             
-            for period in periods:
-                month = period[0]
-                year = period[1]
-                
-                # Check if monthly savings already exist
+            if rows:
+                bump_data_versions(cursor, first_id, last_id)
+            
+            finished = rows < CLEANUP_BATCH_SIZE
+            if finished:
                 cursor.execute(
-                    "SELECT * FROM monthly_savings WHERE user_id = %s AND month = %s AND year = %s",
-                    (user_id, month, year)
+                    "INSERT INTO purge_checkpoints (table_name, cutoff, last_id) VALUES (%s, %s, %s) "
+                    "ON DUPLICATE KEY UPDATE cutoff = VALUES(cutoff), last_id = VALUES(last_id)",
+                    ('daily_totals', cutoff, last_id)
                 )
-                if not cursor.fetchone():
-                    # Calculate and store monthly savings
-                    first_day = datetime(year, month, 1)
-                    last_day = datetime(year, month, calendar.monthrange(year, month)[1])
-                    
-                    # Get total expenses
-                    cursor.execute(
-                        "SELECT SUM(amount) as total FROM expenses WHERE user_id = %s AND date BETWEEN %s AND %s",
-                        (user_id, first_day, last_day)
-                    )
-                    total_expenses_result = cursor.fetchone()
-                    total_expenses = total_expenses_result[0] if total_expenses_result[0] else 0
-                    
-                    # Get total funds
-                    cursor.execute(
-                        "SELECT SUM(amount) as total FROM funds WHERE user_id = %s AND date BETWEEN %s AND %s",
-                        (user_id, first_day, last_day)
-                    )
-                    total_funds_result = cursor.fetchone()
-                    total_funds = total_funds_result[0] if total_funds_result[0] else 0
-                    
-                    # Calculate savings
-                    savings = float(total_funds) - float(total_expenses)
-                    
-                    # Store monthly savings
-                    cursor.execute(
-                        "INSERT INTO monthly_savings (user_id, month, year, total_expenses, total_funds, savings) VALUES (%s, %s, %s, %s, %s, %s)",
-                        (user_id, month, year, total_expenses, total_funds, savings)
-                    )
-                    conn.commit()
-        
-        # Delete expenses older than two months
+            conn.commit()
+            
+            duration = time.monotonic() - started
+            deleted += rows
+            
+            if rows:
+                lock_wait_text = f"{lock_wait:.3f}s" if lock_wait is not None else "n/a"
+                current_app.logger.info(f"Purged {rows} rows from daily_totals (users {first_id}-{last_id}) in {duration:.3f}s, lock wait {lock_wait_text}")
+                pause_after_purge(rows, duration)
+            
+            if finished:
+                break
+    
+    return deleted
+
+def cleanup_old_data():
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        # Calculate date two months ago
+        two_months_ago = retention_cutoff()
+        
+        # Before deleting, ensure monthly savings are calculated and stored
+        rollup_before(conn, cursor, two_months_ago)
+        
+        # Delete expenses and funds older than two months
+        expenses_deleted = purge_before(conn, cursor, 'expenses', two_months_ago)
+        funds_deleted = purge_before(conn, cursor, 'funds', two_months_ago)
+        daily_totals_deleted = purge_daily_totals_before(conn, cursor, two_months_ago)
+        
+        current_app.logger.info(f"Cleaned up data older than {two_months_ago}: {expenses_deleted} expenses, {funds_deleted} funds, {daily_totals_deleted} daily totals")
+    except Exception:
+        conn.rollback()
+        current_app.logger.exception("Cleanup failed")
+        # Let the scheduler record the failure in scheduled_jobs
+        raise
+    finally:
+        cursor.close()
+
+# Rebuild rollups from the raw tables
+# The rebuilds work set-based, one range of REBUILD_USER_BATCH_SIZE user ids
+# per transaction, and only inside the raw retention window: older raw rows may
+# be partly purged, or be bulk-imported stragglers, and no longer add up to the
+# rollups, so those are left untouched.
+# A range with drift gets its users' data versions bumped, so cached charts and
+# ETags built from the drifted rows are not served again.
+REBUILD_USER_BATCH_SIZE = int(os.environ.get('REBUILD_USER_BATCH_SIZE', 100))
+
+def user_id_ranges(cursor):
+    # Consecutive (first, last) ranges of user ids covering the users table
+    cursor.execute("SELECT MIN(id), MAX(id) FROM users")
+    first_id, max_id = cursor.fetchone()
+    if first_id is None:
+        return
+    
+    while first_id <= max_id:
+        yield first_id, min(first_id + REBUILD_USER_BATCH_SIZE - 1, max_id)
+        first_id += REBUILD_USER_BATCH_SIZE
+
+MONTHLY_ROLLUP_SOURCE = """
+    SELECT user_id, year, month, SUM(expenses) AS total_expenses, SUM(funds) AS total_funds
+    FROM (
+        SELECT user_id, YEAR(date) AS year, MONTH(date) AS month, amount AS expenses, 0 AS funds
+        FROM expenses WHERE user_id BETWEEN %(first)s AND %(last)s AND date >= %(cutoff)s
+        UNION ALL
+        SELECT user_id, YEAR(date) AS year, MONTH(date) AS month, 0 AS expenses, amount AS funds
+        FROM funds WHERE user_id BETWEEN %(first)s AND %(last)s AND date >= %(cutoff)s
+    ) AS transactions
+    GROUP BY user_id, year, month
+"""
+
+MONTHLY_ROLLUP_ORPHANS = """
+    stored.user_id BETWEEN %(first)s AND %(last)s AND stored.year * 12 + stored.month - 1 >= %(cutoff_month)s
+    AND NOT EXISTS (
+        SELECT 1 FROM expenses WHERE expenses.user_id = stored.user_id
+        AND expenses.date >= MAKEDATE(stored.year, 1) + INTERVAL (stored.month - 1) MONTH
+        AND expenses.date < MAKEDATE(stored.year, 1) + INTERVAL stored.month MONTH
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM funds WHERE funds.user_id = stored.user_id
+        AND funds.date >= MAKEDATE(stored.year, 1) + INTERVAL (stored.month - 1) MONTH
+        AND funds.date < MAKEDATE(stored.year, 1) + INTERVAL stored.month MONTH
+    )
+"""
+
+def rebuild_monthly_rollups(dry_run=False):
+    """Recompute monthly_savings for the months inside the raw retention window.
+
+    Rollups are upserted from the raw rows and rollups left without raw rows
+    are deleted. Returns the (user_id, year, month) keys that had drifted.
+    """
+    cutoff = retention_cutoff()
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    drifted = []
+    for first, last in user_id_ranges(cursor):
+        repaired = len(drifted)
+        params = {'first': first, 'last': last, 'cutoff': cutoff, 'cutoff_month': month_index(cutoff)}
+        
         cursor.execute(
-            "DELETE FROM expenses WHERE date < %s",
-            (two_months_ago,)
+            f"""
+            SELECT actual.user_id, actual.year, actual.month
+            FROM ({MONTHLY_ROLLUP_SOURCE}) AS actual
+            LEFT JOIN monthly_savings AS stored
+                ON stored.user_id = actual.user_id AND stored.month = actual.month AND stored.year = actual.year
+            WHERE stored.id IS NULL
+                OR stored.total_expenses <> actual.total_expenses
+                OR stored.total_funds <> actual.total_funds
+                OR stored.savings <> actual.total_funds - actual.total_expenses
+            """,
+            params
         )
+        drifted.extend(cursor.fetchall())
+        
+        cursor.execute(f"SELECT stored.user_id, stored.year, stored.month FROM monthly_savings AS stored WHERE {MONTHLY_ROLLUP_ORPHANS}", params)
+        drifted.extend(cursor.fetchall())
+        
+        if not dry_run:
+            cursor.execute(
+                f"""
+                INSERT INTO monthly_savings (user_id, month, year, total_expenses, total_funds, savings)
+                SELECT user_id, month, year, total_expenses, total_funds, total_funds - total_expenses
+                FROM ({MONTHLY_ROLLUP_SOURCE}) AS actual
+                ON DUPLICATE KEY UPDATE
+                    total_expenses = VALUES(total_expenses),
+                    total_funds = VALUES(total_funds),
+                    savings = VALUES(savings)
+                """,
+                params
+            )
+            cursor.execute(f"DELETE stored FROM monthly_savings AS stored WHERE {MONTHLY_ROLLUP_ORPHANS}", params)
+            if len(drifted) > repaired:
+                bump_data_versions(cursor, first, last)
+        
+        conn.commit()
+    
+    cursor.close()
+    
+    return drifted
+
+DAILY_TOTALS_SOURCE = """
+    SELECT user_id, date, category, SUM(expenses) AS expense_sum, SUM(funds) AS fund_sum, COUNT(*) AS txn_count
+    FROM (
+        SELECT user_id, date, category, amount AS expenses, 0 AS funds
+        FROM expenses WHERE user_id BETWEEN %(first)s AND %(last)s AND date >= %(cutoff)s
+        UNION ALL
+        SELECT user_id, date, %(funds_category)s AS category, 0 AS expenses, amount AS funds
+        FROM funds WHERE user_id BETWEEN %(first)s AND %(last)s AND date >= %(cutoff)s
+    ) AS transactions
+    GROUP BY user_id, date, category
+"""
+
+DAILY_TOTALS_ORPHANS = """
+    stored.user_id BETWEEN %(first)s AND %(last)s AND stored.date >= %(cutoff)s
+    AND NOT EXISTS (
+        SELECT 1 FROM expenses WHERE expenses.user_id = stored.user_id
+        AND expenses.date = stored.date AND expenses.category = stored.category
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM funds WHERE funds.user_id = stored.user_id
+        AND funds.date = stored.date AND stored.category = %(funds_category)s
+    )
+"""
+
+def rebuild_daily_totals(dry_run=False):
+    """Recompute daily_totals for the days inside the raw retention window.
+
+    Also backfills the table for data written before it existed. Returns the
+    (user_id, date, category) keys that had drifted or had no raw rows left.
+    """
+    cutoff = retention_cutoff()
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    drifted = []
+    for first, last in user_id_ranges(cursor):
+        repaired = len(drifted)
+        params = {'first': first, 'last': last, 'cutoff': cutoff, 'funds_category': FUNDS_CATEGORY}
         
-        # Delete funds older than two months
         cursor.execute(
-            "DELETE FROM funds WHERE date < %s",
-            (two_months_ago,)
+            f"""
+            SELECT actual.user_id, actual.date, actual.category
+            FROM ({DAILY_TOTALS_SOURCE}) AS actual
+            LEFT JOIN daily_totals AS stored
+                ON stored.user_id = actual.user_id AND stored.date = actual.date AND stored.category = actual.category
+            WHERE stored.user_id IS NULL
+                OR stored.expense_sum <> actual.expense_sum
+                OR stored.fund_sum <> actual.fund_sum
+                OR stored.txn_count <> actual.txn_count
+            """,
+            params
         )
+        drifted.extend(cursor.fetchall())
+        
+        cursor.execute(f"SELECT stored.user_id, stored.date, stored.category FROM daily_totals AS stored WHERE {DAILY_TOTALS_ORPHANS}", params)
+        drifted.extend(cursor.fetchall())
+        
+        if not dry_run:
+            cursor.execute(
+                f"""
+                INSERT INTO daily_totals (user_id, date, category, expense_sum, fund_sum, txn_count)
+                SELECT user_id, date, category, expense_sum, fund_sum, txn_count
+                FROM ({DAILY_TOTALS_SOURCE}) AS actual
+                ON DUPLICATE KEY UPDATE
+                    expense_sum = VALUES(expense_sum),
+                    fund_sum = VALUES(fund_sum),
+                    txn_count = VALUES(txn_count)
+                """,
+                params
+            )
+            cursor.execute(f"DELETE stored FROM daily_totals AS stored WHERE {DAILY_TOTALS_ORPHANS}", params)
+            if len(drifted) > repaired:
+                bump_data_versions(cursor, first, last)
         
         conn.commit()
-        print(f"Cleaned up data older than {two_months_ago}")
-    except Exception as e:
-        print(f"Cleanup error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    
+    cursor.close()
+    
+    return drifted
+
+MONTHLY_CATEGORY_SOURCE = """
+    SELECT user_id, YEAR(date) AS year, MONTH(date) AS month, category, SUM(amount) AS total
+    FROM expenses WHERE user_id BETWEEN %(first)s AND %(last)s AND date >= %(cutoff)s
+    GROUP BY user_id, YEAR(date), MONTH(date), category
+"""
+
+MONTHLY_CATEGORY_ORPHANS = """
+    stored.user_id BETWEEN %(first)s AND %(last)s AND stored.year * 12 + stored.month - 1 >= %(cutoff_month)s
+    AND NOT EXISTS (
+        SELECT 1 FROM expenses WHERE expenses.user_id = stored.user_id AND expenses.category = stored.category
+        AND expenses.date >= MAKEDATE(stored.year, 1) + INTERVAL (stored.month - 1) MONTH
+        AND expenses.date < MAKEDATE(stored.year, 1) + INTERVAL stored.month MONTH
+    )
+"""
+
+def rebuild_category_rollups(dry_run=False):
+    """Recompute monthly_category_totals for the months inside the raw retention window.
 
-# Run cleanup task daily
-def schedule_cleanup():
-    def run_cleanup():
+    Works like rebuild_monthly_rollups. Returns the (user_id, year, month,
+    category) keys that had drifted or had no raw rows left.
+    """
+    cutoff = retention_cutoff()
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    drifted = []
+    for first, last in user_id_ranges(cursor):
+        repaired = len(drifted)
+        params = {'first': first, 'last': last, 'cutoff': cutoff, 'cutoff_month': month_index(cutoff)}
+        
+        cursor.execute(
+            f"""
+            SELECT actual.user_id, actual.year, actual.month, actual.category
+            FROM ({MONTHLY_CATEGORY_SOURCE}) AS actual
+            LEFT JOIN monthly_category_totals AS stored
+                ON stored.user_id = actual.user_id AND stored.year = actual.year
+                AND stored.month = actual.month AND stored.category = actual.category
+            WHERE stored.user_id IS NULL OR stored.total <> actual.total
+            """,
+            params
+        )
+        drifted.extend(cursor.fetchall())
+        
+        cursor.execute(
+            f"SELECT stored.user_id, stored.year, stored.month, stored.category FROM monthly_category_totals AS stored WHERE {MONTHLY_CATEGORY_ORPHANS}",
+            params
+        )
+        drifted.extend(cursor.fetchall())
+        
+        if not dry_run:
+            cursor.execute(
+                f"""
+                INSERT INTO monthly_category_totals (user_id, year, month, category, total)
+                SELECT user_id, year, month, category, total
+                FROM ({MONTHLY_CATEGORY_SOURCE}) AS actual
+                ON DUPLICATE KEY UPDATE total = VALUES(total)
+                """,
+                params
+            )
+            cursor.execute(f"DELETE stored FROM monthly_category_totals AS stored WHERE {MONTHLY_CATEGORY_ORPHANS}", params)
+            if len(drifted) > repaired:
+                bump_data_versions(cursor, first, last)
+        
+        conn.commit()
+    
+    cursor.close()
+    
+    return drifted
+
+@bp.cli.command('rebuild-rollups')
+@click.option('--dry-run', is_flag=True, help='Only report drifted rollups.')
+def rebuild_rollups_command(dry_run):
+    """Rebuild monthly_savings, monthly_category_totals and daily_totals from the expenses and funds tables."""
+    drifted = rebuild_monthly_rollups(dry_run=dry_run)
+    
+    for user_id, year, month in drifted:
+        click.echo(f"Rollup drift for user {user_id}: {calendar.month_abbr[month]} {year}")
+    click.echo(f"{len(drifted)} rollup(s) {'drifted' if dry_run else 'rebuilt'}")
+    
+    drifted = rebuild_category_rollups(dry_run=dry_run)
+    
+    for user_id, year, month, category in drifted:
+        click.echo(f"Category rollup drift for user {user_id}: {calendar.month_abbr[month]} {year} {category}")
+    click.echo(f"{len(drifted)} category rollup(s) {'drifted' if dry_run else 'rebuilt'}")
+    
+    drifted = rebuild_daily_totals(dry_run=dry_run)
+    
+    for user_id, day, category in drifted:
+        click.echo(f"Daily total drift for user {user_id}: {day} {category or 'funds'}")
+    click.echo(f"{len(drifted)} daily total(s) {'drifted' if dry_run else 'rebuilt'}")
+
+# Scheduled jobs
+class CronSchedule:
+    """A five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Fields accept `*`, numbers, ranges (`1-5`), lists (`1,15`) and steps
+    (`*/15`, `1-30/5`, and `5/15` meaning 5 to the end of the field every 15).
+    Day-of-week uses 0 or 7 for Sunday. As in cron, when both day-of-month and
+    day-of-week are restricted a day matches if either does; otherwise both
+    must match.
+    """
+
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Invalid cron expression: {expression}')
+        
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        ]
+        # 7 is Sunday too
+        self.weekdays = sorted({weekday % 7 for weekday in self.weekdays})
+        self.either_day = not fields[2].startswith('*') and not fields[4].startswith('*')
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-'))
+            else:
+                start = int(part)
+                # A stepped single value runs to the end of the field
+                end = high if step else start
+            
+            if start < low or end > high or start > end:
+                raise ValueError(f'Cron field out of range: {field}')
+            if step and int(step) < 1:
+                raise ValueError(f'Cron step must be positive: {field}')
+            values.update(range(start, end + 1, int(step) if step else 1))
+        
+        return sorted(values)
+
+    def next_after(self, moment):
+        """Return the first matching minute strictly after `moment`."""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = moment.date()
+        
+        # Every schedule matches at least once every few years
+        for _ in range(366 * 5):
+            if day.month in self.months and self._matches_day(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= moment:
+                            return candidate
+            day += timedelta(days=1)
+        
+        raise ValueError(f'Cron expression never matches: {self.expression}')
+
+    def _matches_day(self, day):
+        day_matches = day.day in self.days
+        weekday_matches = (day.weekday() + 1) % 7 in self.weekdays
+        if self.either_day:
+            return day_matches or weekday_matches
+        return day_matches and weekday_matches
+
+class Scheduler:
+    """Runs jobs on cron schedules in a background thread.
+
+    Every worker process runs its own scheduler, but a job only runs in the
+    worker that wins a MySQL GET_LOCK for it. The winner records the run in
+    scheduled_jobs, so workers that reach the same slot later skip it.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.app = None
+        self._thread = None
+
+    def add_job(self, name, func, schedule):
+        self.jobs[name] = {'func': func, 'schedule': CronSchedule(schedule)}
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+        
+        self.app = app
+        self._thread = threading.Thread(target=self._run_forever, name='scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run_forever(self):
+        next_runs = {name: job['schedule'].next_after(datetime.now()) for name, job in self.jobs.items()}
+        
         while True:
-            cleanup_old_data()
-            # Sleep for 24 hours
-            time.sleep(24 * 60 * 60)
+            name = min(next_runs, key=next_runs.get)
+            scheduled_for = next_runs[name]
+            
+            delay = (scheduled_for - datetime.now()).total_seconds()
+            if delay > 0:
+                # Wake up at least once a minute so clock changes are picked up
+                time.sleep(min(delay, 60))
+                continue
+            
+            try:
+                with self.app.app_context():
+                    self.run_job(name, scheduled_for)
+            except Exception:
+                self.app.logger.exception(f"Scheduler error in {name}")
+            
+            next_runs[name] = self.jobs[name]['schedule'].next_after(scheduled_for)
+
+    def run_job(self, name, scheduled_for):
+        """Run a job for the given slot unless another worker holds or already ran it."""
+        conn = get_db()
+        cursor = conn.cursor()
+        lock_name = f"{os.environ.get('DB_NAME', 'expense_tracker')}.job.{name}"
+        
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (lock_name,))
+        if cursor.fetchone()[0] != 1:
+            cursor.close()
+            return False
+        
+        try:
+            cursor.execute("SELECT last_scheduled_for FROM scheduled_jobs WHERE name = %s", (name,))
+            row = cursor.fetchone()
+            if row and row[0] and row[0] >= scheduled_for:
+                return False
+            
+            cursor.execute(
+                "INSERT INTO scheduled_jobs (name, last_scheduled_for, last_started_at, last_status, run_by) VALUES (%s, %s, %s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE last_scheduled_for = VALUES(last_scheduled_for), last_started_at = VALUES(last_started_at), "
+                "last_finished_at = NULL, last_status = VALUES(last_status), run_by = VALUES(run_by)",
+                (name, scheduled_for, datetime.now(), 'running', f'{socket.gethostname()}:{os.getpid()}')
+            )
+            conn.commit()
+            
+            status = 'ok'
+            try:
+                self.jobs[name]['func']()
+            except Exception as e:
+                status = f'error: {e}'[:255]
+            
+            cursor.execute(
+                "UPDATE scheduled_jobs SET last_finished_at = %s, last_status = %s WHERE name = %s",
+                (datetime.now(), status, name)
+            )
+            conn.commit()
+            
+            return True
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+            cursor.fetchone()
+            cursor.close()
+
+    def status(self):
+        """Return last-run and next-run information for every job."""
+        conn = get_db()
+        cursor = conn.cursor(dictionary=True)
+        
+        cursor.execute("SELECT name, last_scheduled_for, last_started_at, last_finished_at, last_status, run_by FROM scheduled_jobs")
+        runs = {row['name']: row for row in cursor.fetchall()}
+        
+        cursor.close()
+        
+        now = datetime.now()
+        jobs = []
+        for name, job in self.jobs.items():
+            run = runs.get(name, {})
+            jobs.append({
+                'name': name,
+                'schedule': job['schedule'].expression,
+                'last_scheduled_for': run.get('last_scheduled_for'),
+                'last_started_at': run.get('last_started_at'),
+                'last_finished_at': run.get('last_finished_at'),
+                'last_status': run.get('last_status'),
+                'run_by': run.get('run_by'),
+                'next_run': job['schedule'].next_after(now)
+            })
+        
+        return jobs
+
+scheduler = Scheduler()
+scheduler.add_job('cleanup', cleanup_old_data, os.environ.get('CLEANUP_SCHEDULE', '0 3 * * *'))
+
+scheduler_cli = AppGroup('scheduler', help='Inspect and run scheduled jobs.')
+bp.cli.add_command(scheduler_cli)
+
+@scheduler_cli.command('status')
+def scheduler_status_command():
+    """Show the last and next run of every scheduled job."""
+    for job in scheduler.status():
+        click.echo(f"{job['name']} [{job['schedule']}]")
+        click.echo(f"  last run:  {job['last_started_at'] or 'never'} ({job['last_status'] or 'n/a'}, {job['run_by'] or 'n/a'})")
+        click.echo(f"  next run:  {job['next_run']}")
+
+@scheduler_cli.command('run')
+@with_appcontext
+def scheduler_run_command():
+    """Run the job scheduler in the foreground."""
+    scheduler.start(current_app._get_current_object())
+    click.echo(f"Scheduler running jobs: {', '.join(scheduler.jobs)}")
+    while True:
+        time.sleep(60)
+
+# Startup cost
+IMPORT_SECONDS = time.perf_counter() - _import_started
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 250))
+
+# Heavy dependencies that are only imported on first use
+LAZY_MODULES = ['numpy', 'matplotlib.figure', 'matplotlib.backends.backend_agg']
+
+@bp.cli.command('startup-report')
+def startup_report_command():
+    """Report how long importing the app and its lazy dependencies takes."""
+    app_ms = IMPORT_SECONDS * 1000
+    click.echo(f"{'app':<36}{app_ms:>10.1f} ms{'  OVER BUDGET' if app_ms > STARTUP_BUDGET_MS else ''}")
+    
+    for name in LAZY_MODULES:
+        if name in sys.modules:
+            click.echo(f"{name:<36}{'already imported':>13}")
+            continue
+        started = time.perf_counter()
+        importlib.import_module(name)
+        click.echo(f"{name:<36}{(time.perf_counter() - started) * 1000:>10.1f} ms (deferred to first chart)")
     
-    cleanup_thread = threading.Thread(target=run_cleanup)
-    cleanup_thread.daemon = True
-    cleanup_thread.start()
+    click.echo(f"Budget for app import: {STARTUP_BUDGET_MS:.0f} ms")
 
-# Start cleanup scheduler
-schedule_cleanup()
+# Application factory
+def create_app():
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key')
+    
+    app.session_interface = make_session_interface(app)
+    
+    app.register_blueprint(bp)
+    app.teardown_appcontext(release_db)
+    
+    if IMPORT_SECONDS * 1000 > STARTUP_BUDGET_MS:
+        app.logger.warning(f"App import took {IMPORT_SECONDS * 1000:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)")
+    
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    scheduler.start(app)
+    app.run(debug=True)
@@ -46,7 +46,56 @@ CREATE TABLE IF NOT EXISTS monthly_savings (
     UNIQUE KEY (user_id, month, year)
 );
 
+-- Create daily_totals table; funds are stored under the empty category
+CREATE TABLE IF NOT EXISTS daily_totals (
+    user_id INT NOT NULL,
+    date DATE NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    expense_sum DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    fund_sum DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    txn_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date, category),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- Create monthly_category_totals table
+CREATE TABLE IF NOT EXISTS monthly_category_totals (
+    user_id INT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    total DECIMAL(12, 2) NOT NULL,
+    PRIMARY KEY (user_id, year, month, category),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- Create user_data_versions table
+CREATE TABLE IF NOT EXISTS user_data_versions (
+    user_id INT PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- Create scheduled_jobs table
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    name VARCHAR(64) PRIMARY KEY,
+    last_scheduled_for DATETIME,
+    last_started_at DATETIME,
+    last_finished_at DATETIME,
+    last_status VARCHAR(255),
+    run_by VARCHAR(255)
+);
+
+-- Create purge_checkpoints table
+CREATE TABLE IF NOT EXISTS purge_checkpoints (
+    table_name VARCHAR(64) PRIMARY KEY,
+    cutoff DATE NOT NULL,
+    last_id INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- Indexes for better performance
 CREATE INDEX idx_expenses_user_date ON expenses(user_id, date);
-CREATE INDEX idx_funds_user_date ON funds(user_id, date);
+CREATE INDEX idx_funds_user_date_amount ON funds(user_id, date, amount);
 CREATE INDEX idx_monthly_savings_user_month_year ON monthly_savings(user_id, month, year);
\ No newline at end of file